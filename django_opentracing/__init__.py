@@ -1,4 +1,5 @@
 from .middleware import OpenTracingMiddleware  # noqa
+from .routes import trace_options  # noqa
 from .tracing import DjangoTracing  # noqa
 from .tracing import DjangoTracing as DjangoTracer  # noqa, deprecated
 from ._version import get_versions
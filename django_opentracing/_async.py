@@ -0,0 +1,107 @@
+'''
+Coroutine counterparts of the middleware hooks and the trace() decorator,
+used when running under Django's ASGI handler. Kept in a separate module
+as it requires Python 3.
+'''
+import asyncio
+import functools
+import warnings
+
+from opentracing.scope_managers import ThreadLocalScopeManager
+
+from .routes import _route_view
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:
+    # asgiref < 3.6
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+
+iscoroutinefunction = asyncio.iscoroutinefunction
+
+
+class AsyncMiddlewareMixin(object):
+    '''
+    Swapped in by OpenTracingMiddleware when the next handler in the chain
+    is a coroutine, so that starting and finishing the request span happen
+    directly on the event loop instead of through sync_to_async().
+    '''
+    def _enable_async_mode(self):
+        markcoroutinefunction(self)
+        # Django adapts process_view() to the handler mode, so exposing a
+        # coroutine here avoids the thread hop it would otherwise add.
+        self.process_view = self._aprocess_view
+        self.process_exception = self._record_exception
+
+        # concurrent requests share the thread of the event loop, so their
+        # spans would become the active span of one another.
+        scope_manager = self._tracing.tracer.scope_manager
+        if isinstance(scope_manager, ThreadLocalScopeManager):
+            warnings.warn('the tracer uses a ThreadLocalScopeManager, which '
+                          'mixes up the spans of concurrent requests under '
+                          'ASGI; set OPENTRACING_SCOPE_MANAGER to '
+                          "'contextvars'")
+
+    async def __acall__(self, request):
+        if not self._is_enabled(request):
+            return await self.get_response(request)
+
+        if self._config.instrument:
+            with self._instrument(request, is_async=True):
+                response = await self.get_response(request)
+        else:
+            response = await self.get_response(request)
+
+        self._tracing._finish_tracing(
+            request, response=response,
+            error=getattr(request, '_opentracing_error', None),
+        )
+        return response
+
+    async def _aprocess_view(self, request, view_func, view_args,
+                             view_kwargs):
+        return self._process_view(request, view_func, view_args, view_kwargs)
+
+    def _record_exception(self, request, exception):
+        # Django always calls process_exception() through sync_to_async(),
+        # in a copy of the context of the request where its scope cannot
+        # be closed, so the span is finished by __acall__() instead.
+        request._opentracing_error = exception
+
+
+def trace_coroutine(tracing, view_func, extractors, traced_view=None):
+    '''
+    Async variant of the wrapper built by DjangoTracing.trace(),
+    used for `async def` views.
+    @param traced_view the view the requests are named and sampled
+    after, by default view_func
+    '''
+    if traced_view is None:
+        traced_view = view_func
+
+    @functools.wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # if tracing all already, or disabled, return right away.
+        if tracing._trace_all or not tracing._enabled:
+            return await view_func(request, *args, **kwargs)
+
+        route = tracing._get_route(request, route_view)
+        if route is not None and route.trace is False:
+            return await view_func(request, *args, **kwargs)
+
+        # otherwise, apply tracing.
+        try:
+            tracing._apply_tracing(request, traced_view, extractors, route)
+            r = await view_func(request, *args, **kwargs)
+        except Exception as exc:
+            tracing._finish_tracing(request, error=exc)
+            raise
+
+        tracing._finish_tracing(request, r)
+        return r
+
+    route_view = _route_view(view_func, traced_view, wrapper)
+    return wrapper
@@ -0,0 +1,18 @@
+'''
+Following of the async iterators of streaming responses. Kept apart from
+_async as async generators require Python 3.6, and only imported when a
+response is async, which requires Django 4.2.
+'''
+
+
+async def iterate_stream(stream, content):
+    '''
+    Async variant of ResponseStream._iterate(), for the async iterators
+    of streaming responses.
+    '''
+    async for chunk in content:
+        stream._record(chunk)
+        yield chunk
+
+    stream.exhausted = True
+    stream._finish()
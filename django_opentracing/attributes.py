@@ -0,0 +1,122 @@
+try:
+    from collections.abc import Mapping
+except ImportError:
+    # Python 2
+    from collections import Mapping
+
+import six
+
+# the types a tracer accepts as tag values, set as is.
+_TAG_TYPES = six.integer_types + (float, bool)
+
+_MISSING = object()
+
+
+class AttributeExtractor(object):
+    '''
+    Reads a value from the request to be set as a tag on its span. The
+    spec is resolved when the extractor is created rather than for every
+    request.
+    @param tag the name of the tag
+    @param spec the request attribute to read, or a dotted path into it
+    where every part after the first is a key or an attribute (e.g.
+    'META.HTTP_USER_AGENT', 'headers.X-Request-Id', 'user.pk'), or a
+    callable(request) returning the value; errors raised by callables
+    are ignored, as for start_span_cb
+    '''
+    def __init__(self, tag, spec=None):
+        if spec is None:
+            spec = tag
+
+        self.tag = tag
+        if callable(spec):
+            self._get = spec
+        else:
+            parts = spec.split('.')
+            self._attribute = parts[0]
+            self._path = tuple(parts[1:])
+            self._get = self._get_path
+
+    def __call__(self, request):
+        '''
+        Returns the value of the attribute, or None if the request has no
+        such attribute, or it could not be read.
+        '''
+        try:
+            return self._get(request)
+        except Exception:
+            return None
+
+    def _get_path(self, request):
+        value = getattr(request, self._attribute)
+        for part in self._path:
+            if isinstance(value, Mapping):
+                value = value[part]
+            else:
+                value = getattr(value, part)
+        return value
+
+
+def compile_attributes(attributes):
+    '''
+    Returns the extractors of the traced attributes.
+    @param attributes request attributes or dotted paths, each used as
+    the name of its tag, or a dict of tag names to dotted paths or
+    callables
+    '''
+    if isinstance(attributes, Mapping):
+        return tuple(AttributeExtractor(tag, spec)
+                     for tag, spec in attributes.items())
+
+    return tuple(AttributeExtractor(attribute) for attribute in attributes)
+
+
+def to_tag_value(value, max_length=None):
+    '''
+    Returns the value to tag a span with: numbers and booleans are kept,
+    anything else is converted to a string truncated to max_length.
+    Mappings such as request.META only keep their string and number
+    entries, leaving out objects like wsgi.input; they are formatted up
+    to max_length, so that large ones cost no more than small ones.
+    Returns None for empty values.
+    '''
+    if isinstance(value, _TAG_TYPES):
+        return value
+
+    if isinstance(value, six.binary_type):
+        if max_length is not None:
+            # keep one more byte, so that the value is still truncated.
+            value = value[:max_length + 1]
+        value = value.decode('utf-8', 'replace')
+    elif isinstance(value, Mapping):
+        value = _format_mapping(value, max_length)
+    elif not isinstance(value, six.string_types):
+        value = str(value)
+
+    if not value:
+        return None
+
+    if max_length is not None and len(value) > max_length:
+        value = value[:max_length] + '...'
+
+    return value
+
+
+def _format_mapping(mapping, max_length):
+    # formatted like a dict, stopping once max_length is reached.
+    parts = []
+    length = 1
+    for key, value in mapping.items():
+        if not isinstance(value, six.string_types + _TAG_TYPES):
+            continue
+
+        if max_length is not None and \
+                isinstance(value, six.string_types):
+            value = value[:max_length]
+        part = '%r: %r' % (key, value)
+        parts.append(part)
+        length += len(part) + 2
+        if max_length is not None and length > max_length:
+            break
+
+    return '{' + ', '.join(parts) + '}'
@@ -0,0 +1,175 @@
+import functools
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .context import RequestLocal
+
+_now = getattr(time, 'perf_counter', time.time)
+
+# upper bounds (in ms) of the latency histogram buckets.
+HISTOGRAM_BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100)
+
+TRACED_METHODS = ('get', 'set', 'get_many', 'set_many', 'delete')
+
+_current = RequestLocal('django_opentracing.cache')
+
+
+class CacheCollector(object):
+    '''
+    Aggregates the cache operations of a request into counters and
+    latency histograms, reported on the request span by finish()
+    instead of creating one span per operation.
+    '''
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.operations = {}
+        # turned off by the route options of the view.
+        self.active = True
+        # nesting level, so operations implemented on top of others
+        # (e.g. the default get_many() calling get()) count once.
+        self.depth = 0
+
+    def record(self, operation, duration, hits=0, misses=0, error=False):
+        self.hits += hits
+        self.misses += misses
+        if error:
+            self.errors += 1
+
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = {
+                'count': 0,
+                'time': 0.0,
+                'max': 0.0,
+                'buckets': [0] * (len(HISTOGRAM_BUCKETS) + 1),
+            }
+
+        stats['count'] += 1
+        stats['time'] += duration
+        stats['max'] = max(stats['max'], duration)
+
+        duration_ms = duration * 1000
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if duration_ms <= bound:
+                break
+        else:
+            i = len(HISTOGRAM_BUCKETS)
+        stats['buckets'][i] += 1
+
+    def finish(self, span):
+        '''
+        Sets the summary tags on the request span, and logs the per
+        operation latency histograms.
+        '''
+        if not self.operations:
+            return
+
+        calls = sum(stats['count'] for stats in self.operations.values())
+        span.set_tag('cache.calls', calls)
+        span.set_tag('cache.hits', self.hits)
+        span.set_tag('cache.misses', self.misses)
+        if self.hits or self.misses:
+            span.set_tag('cache.hit_ratio',
+                         float(self.hits) / (self.hits + self.misses))
+        if self.errors:
+            span.set_tag('cache.errors', self.errors)
+        span.set_tag('cache.time_ms', round(
+            sum(stats['time'] for stats in self.operations.values()) * 1000,
+            3
+        ))
+
+        summary = {'event': 'cache.summary'}
+        for operation, stats in self.operations.items():
+            prefix = 'cache.%s.' % operation
+            summary[prefix + 'count'] = stats['count']
+            summary[prefix + 'time_ms'] = round(stats['time'] * 1000, 3)
+            summary[prefix + 'max_ms'] = round(stats['max'] * 1000, 3)
+            summary[prefix + 'histogram_ms'] = _format_histogram(
+                stats['buckets']
+            )
+        span.log_kv(summary)
+
+
+def _format_histogram(buckets):
+    bounds = ['<=%s' % bound for bound in HISTOGRAM_BUCKETS] + ['+Inf']
+    return ' '.join('%s:%d' % (bound, count)
+                    for bound, count in zip(bounds, buckets) if count)
+
+
+def _count_hits(operation, args, kwargs, result):
+    if operation == 'get':
+        if len(args) > 1:
+            default = args[1]
+        else:
+            default = kwargs.get('default')
+        return (0, 1) if result is default else (1, 0)
+
+    if operation == 'get_many':
+        keys = args[0] if args else kwargs.get('keys', ())
+        try:
+            return len(result), len(keys) - len(result)
+        except TypeError:
+            return len(result), 0
+
+    return 0, 0
+
+
+def _wrap(method, operation):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        collector = _current.get()
+        if collector is None or collector.depth or not collector.active:
+            return method(self, *args, **kwargs)
+
+        error = True
+        result = None
+        collector.depth += 1
+        start = _now()
+        try:
+            result = method(self, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            duration = _now() - start
+            collector.depth -= 1
+            hits, misses = (0, 0) if error else \
+                _count_hits(operation, args, kwargs, result)
+            collector.record(operation, duration, hits, misses, error)
+
+    wrapper._opentracing_traced = True
+    return wrapper
+
+
+def install_cache_tracing(aliases=None):
+    '''
+    Instruments the cache operations of the backends used by the given
+    cache aliases (all of them by default). Backend classes are patched
+    once; operations outside of a traced request are passed through.
+    '''
+    caches = getattr(settings, 'CACHES', {})
+    for alias in (aliases if aliases is not None else caches):
+        backend = import_string(caches[alias]['BACKEND'])
+        for operation in TRACED_METHODS:
+            method = getattr(backend, operation, None)
+            if method is None or getattr(method, '_opentracing_traced',
+                                         False):
+                continue
+
+            setattr(backend, operation, _wrap(method, operation))
+
+
+def start_cache_collection():
+    '''
+    Starts collecting the cache operations of the current request.
+    Returns the collector, and a token to pass to stop_cache_collection().
+    '''
+    collector = CacheCollector()
+    return collector, _current.set(collector)
+
+
+def stop_cache_collection(token):
+    _current.reset(token)
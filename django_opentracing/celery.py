@@ -0,0 +1,212 @@
+'''
+Tracing of Celery tasks. Publishing a task while a span is active
+creates a producer span, whose context travels with the task message;
+the worker runs the task under a consumer span, child of the producer
+span. Requires Celery.
+'''
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+from celery import signals
+from celery import states
+import opentracing
+from opentracing.ext import tags
+
+# the message header carrying the span context.
+HEADER = 'opentracing'
+
+# the DjangoTracing creating the task spans; None uses the one set in the
+# OPENTRACING_TRACING setting, or the global tracer.
+_tracing = None
+
+# the producer span of the task being published by this thread.
+_publishing = threading.local()
+
+# the maximum number of scopes of tasks being run kept, the spans of the
+# oldest ones, whose task_postrun was never sent, being finished to make
+# room for new ones.
+MAX_SCOPES = 1000
+
+# the scopes of the tasks being run, by task id, oldest first.
+_scopes = OrderedDict()
+_scopes_lock = threading.Lock()
+
+
+def install_celery_tracing(tracing=None):
+    '''
+    Traces the publishing and the running of Celery tasks. To be called
+    in both the web and the worker processes, e.g. in the module
+    defining the Celery application.
+    @param tracing the DjangoTracing used to create task spans, by
+    default the one of the OPENTRACING_TRACING setting
+    '''
+    global _tracing
+    _tracing = tracing
+
+    for signal, receiver in _RECEIVERS:
+        signal.connect(receiver, dispatch_uid=__name__)
+
+
+def uninstall_celery_tracing():
+    for signal, receiver in _RECEIVERS:
+        signal.disconnect(dispatch_uid=__name__)
+
+
+def _get_tracer():
+    tracing = _tracing
+    if tracing is None:
+        from django.conf import settings
+        tracing = getattr(settings, 'OPENTRACING_TRACING', None)
+
+    return opentracing.tracer if tracing is None else tracing.tracer
+
+
+def _get_carrier(request):
+    carrier = request.get(HEADER)
+    if carrier is None:
+        # tasks applied locally keep the headers they were given apart.
+        carrier = (request.get('headers') or {}).get(HEADER)
+    return carrier
+
+
+def _before_publish(sender=None, headers=None, routing_key=None, **kwargs):
+    tracer = _get_tracer()
+    parent = tracer.active_span
+    if parent is None or headers is None:
+        return
+
+    span = tracer.start_span(
+        operation_name=sender,
+        child_of=parent,
+        tags={
+            tags.COMPONENT: 'celery',
+            tags.SPAN_KIND: tags.SPAN_KIND_PRODUCER,
+            tags.MESSAGE_BUS_DESTINATION: routing_key,
+            'celery.task_id': headers.get('id'),
+        }
+    )
+
+    carrier = {}
+    tracer.inject(span.context, opentracing.Format.TEXT_MAP, carrier)
+    headers[HEADER] = carrier
+
+    # a previous publish may have failed before after_task_publish.
+    _finish_publishing()
+    _publishing.span = span
+
+
+def _after_publish(**kwargs):
+    _finish_publishing()
+
+
+def _finish_publishing():
+    span = getattr(_publishing, 'span', None)
+    if span is not None:
+        _publishing.span = None
+        span.finish()
+
+
+def _prerun(task_id=None, task=None, **kwargs):
+    tracer = _get_tracer()
+    request = task.request
+
+    parent = None
+    carrier = _get_carrier(request)
+    if carrier is not None:
+        try:
+            parent = tracer.extract(opentracing.Format.TEXT_MAP, carrier)
+        except (opentracing.InvalidCarrierException,
+                opentracing.SpanContextCorruptedException):
+            pass
+    elif request.get('is_eager'):
+        # tasks run eagerly are not published, but run in the thread
+        # that applied them.
+        parent = tracer.active_span
+
+    scope = tracer.start_active_span(
+        task.name,
+        child_of=parent,
+        finish_on_close=True,
+        tags={
+            tags.COMPONENT: 'celery',
+            tags.SPAN_KIND: tags.SPAN_KIND_CONSUMER,
+            'celery.task_id': task_id,
+            'celery.retries': request.get('retries') or 0,
+        }
+    )
+    with _scopes_lock:
+        _scopes.pop(task_id, None)
+        _scopes[task_id] = scope
+        while len(_scopes) > MAX_SCOPES:
+            _, stale = _scopes.popitem(last=False)
+            _finish_stale(stale, None, 'too many running tasks')
+
+
+def _finish_stale(scope, state, message):
+    # the scope may have been activated by another thread, where it can
+    # only be closed, so only finish its span.
+    if state is not None:
+        scope.span.set_tag('celery.state', state)
+    scope.span.log_kv({
+        'event': 'reaped',
+        'message': message,
+    })
+    scope.span.finish()
+
+
+def _discard(task_id, state, message):
+    with _scopes_lock:
+        scope = _scopes.pop(task_id, None)
+    if scope is not None:
+        _finish_stale(scope, state, message)
+
+
+def _revoked(request=None, **kwargs):
+    # a task terminated while running never sends task_postrun.
+    _discard(getattr(request, 'id', None), states.REVOKED, 'task revoked')
+
+
+def _rejected(message=None, **kwargs):
+    headers = getattr(message, 'headers', None) or {}
+    _discard(headers.get('id'), states.REJECTED, 'task rejected')
+
+
+def _unknown(id=None, **kwargs):
+    _discard(id, None, 'task unknown')
+
+
+def _failure(task_id=None, exception=None, **kwargs):
+    scope = _scopes.get(task_id)
+    if scope is None:
+        return
+
+    scope.span.set_tag(tags.ERROR, True)
+    scope.span.log_kv({
+        'event': tags.ERROR,
+        'error.object': exception,
+    })
+
+
+def _postrun(task_id=None, state=None, **kwargs):
+    with _scopes_lock:
+        scope = _scopes.pop(task_id, None)
+    if scope is None:
+        return
+
+    if state is not None:
+        scope.span.set_tag('celery.state', state)
+    scope.close()
+
+
+_RECEIVERS = (
+    (signals.before_task_publish, _before_publish),
+    (signals.after_task_publish, _after_publish),
+    (signals.task_prerun, _prerun),
+    (signals.task_failure, _failure),
+    (signals.task_postrun, _postrun),
+    (signals.task_revoked, _revoked),
+    (signals.task_rejected, _rejected),
+    (signals.task_unknown, _unknown),
+)
@@ -0,0 +1,208 @@
+'''
+Tracing of outgoing HTTP requests. The low-level http.client (httplib)
+connections used by urllib, and by requests through urllib3, are patched
+to create a client span, child of the active span, for every request and
+to inject its context in the request headers.
+'''
+import functools
+import time
+
+import opentracing
+from opentracing.ext import tags
+from six.moves import http_client
+
+# the DjangoTracing whose tracer creates the client spans; None disables
+# the tracing of outgoing requests.
+_tracing = None
+
+
+def install_client_tracing(tracing):
+    '''
+    Traces the outgoing HTTP requests made while a span is active.
+    @param tracing the DjangoTracing used to create client spans
+    '''
+    global _tracing
+    _tracing = tracing
+
+    base = http_client.HTTPConnection
+    if getattr(base.putrequest, '_opentracing_traced', False):
+        return
+
+    _patch(base, 'putrequest', _putrequest)
+    _patch(base, 'endheaders', _endheaders)
+    _patch(base, 'getresponse', _getresponse)
+    for cls in _connection_classes():
+        if 'connect' in vars(cls):
+            _patch(cls, 'connect', _connect)
+
+
+def uninstall_client_tracing():
+    '''
+    Stops tracing outgoing HTTP requests; the connections stay patched
+    but pass requests through.
+    '''
+    global _tracing
+    _tracing = None
+
+
+def _connection_classes():
+    classes = [http_client.HTTPConnection]
+    if hasattr(http_client, 'HTTPSConnection'):
+        classes.append(http_client.HTTPSConnection)
+
+    try:
+        from urllib3 import connection
+    except ImportError:
+        pass
+    else:
+        # urllib3 (used by requests) opens its sockets itself.
+        classes.extend([connection.HTTPConnection,
+                        connection.HTTPSConnection])
+
+    return classes
+
+
+def _patch(cls, name, wrapper_factory):
+    method = vars(cls)[name]
+    wrapper = functools.wraps(method)(wrapper_factory(method))
+    wrapper._opentracing_traced = True
+    setattr(cls, name, wrapper)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _get_url(conn, url):
+    if url.startswith(('http://', 'https://')):
+        # absolute URL, when going through a proxy.
+        return url
+
+    scheme = 'https' if conn.default_port == 443 else 'http'
+    if conn.port in (None, conn.default_port):
+        return '%s://%s%s' % (scheme, conn.host, url)
+
+    return '%s://%s:%s%s' % (scheme, conn.host, conn.port, url)
+
+
+def _finish(conn, error=None):
+    span = conn.__dict__.pop('_opentracing_span', None)
+    if span is None:
+        return
+
+    if error is not None:
+        span.set_tag(tags.ERROR, True)
+        span.log_kv({
+            'event': tags.ERROR,
+            'error.object': error,
+        })
+    span.finish()
+
+
+def _putrequest(putrequest):
+    def wrapper(self, method, url, *args, **kwargs):
+        # a previous request may have failed before getresponse().
+        _finish(self)
+
+        tracing = _tracing
+        parent = tracing.tracer.active_span if tracing is not None else None
+        start_time = time.time()
+        result = putrequest(self, method, url, *args, **kwargs)
+        if parent is None:
+            return result
+
+        span = tracing.tracer.start_span(
+            operation_name=method,
+            child_of=parent,
+            start_time=start_time,
+            tags={
+                tags.COMPONENT: 'http.client',
+                tags.SPAN_KIND: tags.SPAN_KIND_RPC_CLIENT,
+                tags.HTTP_METHOD: method,
+                tags.HTTP_URL: _get_url(self, url),
+                tags.PEER_HOSTNAME: self.host,
+                tags.PEER_PORT: self.port or self.default_port,
+            }
+        )
+
+        # the socket may have been opened before this request, for
+        # instance by urllib3; otherwise an open socket is a pooled
+        # connection being reused.
+        connect_time = self.__dict__.pop('_opentracing_connect_time', None)
+        if connect_time is not None:
+            span.set_tag('http.connect_ms', _ms(connect_time))
+        span.set_tag('http.connection_reused',
+                     connect_time is None and self.sock is not None)
+
+        headers = {}
+        tracing.tracer.inject(span.context, opentracing.Format.HTTP_HEADERS,
+                              headers)
+        for name, value in headers.items():
+            self.putheader(name, value)
+
+        self._opentracing_span = span
+        return result
+
+    return wrapper
+
+
+def _connect(connect):
+    def wrapper(self):
+        # HTTPS connections call the HTTP connect(), only time the
+        # outermost call, which includes the TLS handshake.
+        if getattr(self, '_opentracing_connecting', False):
+            return connect(self)
+
+        self._opentracing_connecting = True
+        start_time = time.time()
+        try:
+            return connect(self)
+        finally:
+            self._opentracing_connecting = False
+            duration = time.time() - start_time
+            span = getattr(self, '_opentracing_span', None)
+            if span is not None:
+                span.set_tag('http.connect_ms', _ms(duration))
+            else:
+                self._opentracing_connect_time = duration
+
+    return wrapper
+
+
+def _endheaders(endheaders):
+    def wrapper(self, *args, **kwargs):
+        if getattr(self, '_opentracing_span', None) is None:
+            return endheaders(self, *args, **kwargs)
+
+        try:
+            result = endheaders(self, *args, **kwargs)
+        except Exception as exc:
+            _finish(self, error=exc)
+            raise
+
+        self._opentracing_sent = time.time()
+        return result
+
+    return wrapper
+
+
+def _getresponse(getresponse):
+    def wrapper(self, *args, **kwargs):
+        span = getattr(self, '_opentracing_span', None)
+        if span is None:
+            return getresponse(self, *args, **kwargs)
+
+        try:
+            response = getresponse(self, *args, **kwargs)
+        except Exception as exc:
+            _finish(self, error=exc)
+            raise
+
+        sent = getattr(self, '_opentracing_sent', None)
+        if sent is not None:
+            span.set_tag('http.ttfb_ms', _ms(time.time() - sent))
+        span.set_tag(tags.HTTP_STATUS_CODE, response.status)
+        _finish(self)
+        return response
+
+    return wrapper
@@ -0,0 +1,192 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+import six
+
+from .attributes import compile_attributes, Mapping
+from .finishing import SpanFinisher
+from .naming import OperationNameResolver
+from .paths import PathMatcher
+from .routes import RouteRegistry
+from .switch import FileSwitch
+
+
+_FIELDS = [
+    'enabled',
+    'toggle_signal',
+    'disabled_file',
+    'trace_all',
+    'traced_attributes',
+    'attribute_extractors',
+    'max_tag_length',
+    'start_span_cb',
+    'sampler',
+    'tail_sampler',
+    'metrics',
+    'propagation_headers',
+    'max_scopes',
+    'scope_max_age',
+    'excluded_paths',
+    'operation_name',
+    'routes',
+    'trace_db',
+    'db_aliases',
+    'db_slow_query_ms',
+    'trace_cache',
+    'cache_aliases',
+    'trace_templates',
+    'template_max_spans',
+    'trace_client',
+    'trace_breakdown',
+    'trace_streaming',
+    'async_finish',
+    'finish_queue_size',
+    'finish_drop_policy',
+]
+
+
+class TracingConfig(namedtuple('TracingConfig', _FIELDS)):
+    '''
+    Immutable snapshot of the OPENTRACING_* settings, resolved once
+    when the middleware is created so that handling a request does not
+    go through django.conf.settings.
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def from_settings(cls):
+        # set the head sampler, if any.
+        sampler = getattr(settings, 'OPENTRACING_SAMPLER', None)
+        if isinstance(sampler, six.string_types):
+            sampler = import_string(sampler)
+
+        # and the tail sampler.
+        tail_sampler = getattr(settings, 'OPENTRACING_TAIL_SAMPLER', None)
+        if isinstance(tail_sampler, six.string_types):
+            tail_sampler = import_string(tail_sampler)
+
+        # the RequestMetrics aggregating the requests, sampled or not.
+        metrics = getattr(settings, 'OPENTRACING_METRICS', None)
+        if isinstance(metrics, six.string_types):
+            metrics = import_string(metrics)
+
+        propagation_headers = getattr(settings,
+                                      'OPENTRACING_PROPAGATION_HEADERS', None)
+        if propagation_headers is not None:
+            propagation_headers = tuple(propagation_headers)
+
+        # requests to these paths are not traced by the middleware.
+        excluded_paths = PathMatcher(
+            getattr(settings, 'OPENTRACING_EXCLUDED_PATHS', ())
+        )
+
+        # a list of attributes, or a dict of tag names to attributes.
+        traced_attributes = getattr(settings,
+                                    'OPENTRACING_TRACED_ATTRIBUTES', ())
+        attribute_extractors = compile_attributes(traced_attributes)
+        if isinstance(traced_attributes, Mapping):
+            traced_attributes = traced_attributes.items()
+
+        db_aliases = getattr(settings, 'OPENTRACING_TRACE_DB_ALIASES', None)
+        if db_aliases is not None:
+            db_aliases = tuple(db_aliases)
+
+        cache_aliases = getattr(settings, 'OPENTRACING_TRACE_CACHE_ALIASES',
+                                None)
+        if cache_aliases is not None:
+            cache_aliases = tuple(cache_aliases)
+
+        # tracing is disabled while this file exists.
+        disabled_file = getattr(settings, 'OPENTRACING_DISABLED_FILE', None)
+        if disabled_file is not None:
+            disabled_file = FileSwitch(
+                disabled_file,
+                getattr(settings, 'OPENTRACING_DISABLED_FILE_INTERVAL', 1.0)
+            )
+
+        return cls(
+            enabled=getattr(settings, 'OPENTRACING_ENABLED', True),
+            toggle_signal=getattr(settings, 'OPENTRACING_TOGGLE_SIGNAL',
+                                  None),
+            disabled_file=disabled_file,
+            # trace_all defaults to True when used as middleware.
+            trace_all=getattr(settings, 'OPENTRACING_TRACE_ALL', True),
+            traced_attributes=tuple(traced_attributes),
+            attribute_extractors=attribute_extractors,
+            max_tag_length=getattr(settings, 'OPENTRACING_MAX_TAG_LENGTH',
+                                   1024),
+            start_span_cb=getattr(settings, 'OPENTRACING_START_SPAN_CB',
+                                  None),
+            sampler=sampler,
+            tail_sampler=tail_sampler,
+            metrics=metrics,
+            propagation_headers=propagation_headers,
+            max_scopes=getattr(settings, 'OPENTRACING_MAX_SCOPES', None),
+            scope_max_age=getattr(settings, 'OPENTRACING_SCOPE_MAX_AGE',
+                                  None),
+            excluded_paths=excluded_paths or None,
+            operation_name=OperationNameResolver(
+                getattr(settings, 'OPENTRACING_OPERATION_NAME', 'function')
+            ),
+            routes=RouteRegistry(getattr(settings, 'OPENTRACING_ROUTES',
+                                         None)),
+            trace_db=getattr(settings, 'OPENTRACING_TRACE_DB', False),
+            db_aliases=db_aliases,
+            db_slow_query_ms=getattr(settings,
+                                     'OPENTRACING_DB_SLOW_QUERY_MS', 0),
+            trace_cache=getattr(settings, 'OPENTRACING_TRACE_CACHE', False),
+            cache_aliases=cache_aliases,
+            trace_templates=getattr(settings, 'OPENTRACING_TRACE_TEMPLATES',
+                                    False),
+            template_max_spans=getattr(settings,
+                                       'OPENTRACING_TEMPLATE_MAX_SPANS', 20),
+            trace_client=getattr(settings, 'OPENTRACING_TRACE_CLIENT', False),
+            trace_breakdown=getattr(settings, 'OPENTRACING_TRACE_BREAKDOWN',
+                                    False),
+            trace_streaming=getattr(settings, 'OPENTRACING_TRACE_STREAMING',
+                                    True),
+            async_finish=getattr(settings, 'OPENTRACING_ASYNC_FINISH', False),
+            finish_queue_size=getattr(settings,
+                                      'OPENTRACING_FINISH_QUEUE_SIZE', 1000),
+            finish_drop_policy=getattr(settings,
+                                       'OPENTRACING_FINISH_DROP_POLICY',
+                                       'drop_newest'),
+        )
+
+    @property
+    def instrument(self):
+        '''
+        Whether the middleware collects data around the request handling.
+        '''
+        return self.trace_db or self.trace_cache or self.trace_templates
+
+    def apply(self, tracing):
+        '''
+        Sets the options read by DjangoTracing itself, as they are also
+        used by the trace() decorator.
+        '''
+        tracing._enabled = self.enabled
+        tracing._trace_all = self.trace_all
+        tracing._start_span_cb = self.start_span_cb
+        tracing._max_tag_length = self.max_tag_length
+        tracing._trace_breakdown = self.trace_breakdown
+        tracing._trace_streaming = self.trace_streaming
+        tracing._sampler = self.sampler
+        tracing._tail_sampler = self.tail_sampler
+        tracing._metrics = self.metrics
+        tracing._get_operation_name = self.operation_name
+        tracing._routes = self.routes
+        tracing._set_propagation_headers(self.propagation_headers)
+        tracing._current_scopes.max_scopes = self.max_scopes
+        tracing._current_scopes.max_age = self.scope_max_age
+
+        finisher = tracing._finisher
+        if not self.async_finish:
+            finisher = None
+        elif finisher is None or \
+                finisher.max_queue_size != self.finish_queue_size or \
+                finisher.drop_policy != self.finish_drop_policy:
+            finisher = SpanFinisher(self.finish_queue_size,
+                                    self.finish_drop_policy)
+        tracing._set_finisher(finisher)
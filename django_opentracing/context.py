@@ -0,0 +1,45 @@
+import threading
+
+try:
+    import contextvars
+except ImportError:
+    # Python < 3.7
+    contextvars = None
+
+
+class RequestLocal(object):
+    '''
+    Holds a value for the request being handled. Backed by a context
+    variable when available, so the value also follows the request into
+    the coroutines and worker threads of Django's ASGI handler, and by a
+    thread local otherwise.
+    '''
+    def __init__(self, name):
+        if contextvars is not None:
+            self._var = contextvars.ContextVar(name, default=None)
+        else:
+            self._var = None
+            self._local = threading.local()
+
+    def get(self):
+        if self._var is not None:
+            return self._var.get()
+
+        return getattr(self._local, 'value', None)
+
+    def set(self, value):
+        '''
+        Returns a token to pass to reset() to restore the previous value.
+        '''
+        if self._var is not None:
+            return self._var.set(value)
+
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        if self._var is not None:
+            self._var.reset(token)
+        else:
+            self._local.value = token
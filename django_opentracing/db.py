@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+import re
+import time
+
+from django.db import connections
+from opentracing.ext import tags
+
+# normalized statements are cached, as requests repeat the same queries.
+_MAX_CACHED_STATEMENTS = 1000
+_statements = {}
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    '''
+    Returns the statement with its literals replaced by placeholders,
+    lists of placeholders collapsed and whitespace squeezed, so that
+    queries only differing by their values compare equal.
+    '''
+    try:
+        return _statements[sql]
+    except KeyError:
+        pass
+
+    statement = _STRINGS.sub('?', sql)
+    statement = _NUMBERS.sub('?', statement)
+    statement = _LISTS.sub('(...)', statement)
+    statement = _SPACES.sub(' ', statement).strip()
+
+    if len(_statements) >= _MAX_CACHED_STATEMENTS:
+        _statements.clear()
+    _statements[sql] = statement
+    return statement
+
+
+class QueryCollector(object):
+    '''
+    Database execute wrapper recording the queries run while handling
+    a request. Queries slower than slow_query_ms become child spans of
+    the request span, and finish() tags the request span with the
+    number of queries and of duplicated ones (a sign of N+1 queries).
+    @param tracing the DjangoTracing tracing the request
+    @param request the HttpRequest being handled
+    @param slow_query_ms the duration above which a query gets a span
+    '''
+    def __init__(self, tracing, request, slow_query_ms=0):
+        self.tracing = tracing
+        self.request = request
+        self.slow_query_ms = slow_query_ms
+        # turned off by the route options of the view.
+        self.active = True
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        span = self.tracing.get_span(self.request) if self.active else None
+        if span is None:
+            return execute(sql, params, many, context)
+
+        error = None
+        start_time = time.time()
+        try:
+            return execute(sql, params, many, context)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            finish_time = time.time()
+            self._record(span, sql, context, start_time, finish_time, error)
+
+    def _record(self, span, sql, context, start_time, finish_time, error):
+        statement = normalize_sql(sql)
+        duration = finish_time - start_time
+
+        self.query_count += 1
+        self.query_time += duration
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+        if error is None and duration * 1000 < self.slow_query_ms:
+            return
+
+        connection = context['connection']
+        query_span = self.tracing.tracer.start_span(
+            operation_name=statement.split(' ', 1)[0].upper(),
+            child_of=span,
+            start_time=start_time,
+            tags={
+                tags.COMPONENT: 'django.db',
+                tags.SPAN_KIND: tags.SPAN_KIND_RPC_CLIENT,
+                tags.DATABASE_TYPE: connection.vendor,
+                tags.DATABASE_INSTANCE: connection.alias,
+                tags.DATABASE_STATEMENT: statement,
+            }
+        )
+        if error is not None:
+            query_span.set_tag(tags.ERROR, True)
+            query_span.log_kv({
+                'event': tags.ERROR,
+                'error.object': error,
+            })
+        query_span.finish(finish_time=finish_time)
+
+    def finish(self, span):
+        '''
+        Sets the summary tags on the request span.
+        '''
+        if self.query_count == 0:
+            return
+
+        duplicates = self.query_count - len(self.statements)
+        span.set_tag('db.query_count', self.query_count)
+        span.set_tag('db.query_time_ms',
+                     round(self.query_time * 1000, 3))
+        span.set_tag('db.duplicate_query_count', duplicates)
+        if duplicates:
+            statement, count = max(self.statements.items(),
+                                   key=lambda item: item[1])
+            span.set_tag('db.most_duplicated_statement', statement)
+            span.set_tag('db.most_duplicated_count', count)
+
+
+@contextmanager
+def trace_queries(tracing, request, aliases=None, slow_query_ms=0):
+    '''
+    Installs a QueryCollector on the given database aliases (all of them
+    by default) for the duration of the block.
+    '''
+    collector = QueryCollector(tracing, request, slow_query_ms)
+    tracing._add_collector(request, collector)
+
+    wrappers = []
+    try:
+        for alias in (aliases if aliases is not None else connections):
+            wrapper = connections[alias].execute_wrapper(collector)
+            wrapper.__enter__()
+            wrappers.append(wrapper)
+
+        yield collector
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
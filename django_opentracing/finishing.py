@@ -0,0 +1,141 @@
+from collections import deque
+import os
+import threading
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest', 'finish_inline')
+
+_STOP = object()
+
+
+class SpanFinisher(object):
+    '''
+    Finishes spans on a background thread, so that the work a tracer
+    does when a span finishes (serialization, reporting) is kept out of
+    the request. Spans are handed over with their finish time through a
+    bounded queue; the request threads never wait on a lock.
+    @param max_queue_size the maximum number of spans waiting to be
+    finished
+    @param drop_policy what to do with a span when the queue is full:
+    'drop_newest' does not finish it, 'drop_oldest' gives up on the
+    oldest span in the queue instead, and 'finish_inline' finishes it in
+    the request thread
+    '''
+    def __init__(self, max_queue_size=1000, drop_policy='drop_newest'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError('unknown drop policy: %r' % (drop_policy,))
+
+        self.max_queue_size = max_queue_size
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.finished = 0
+
+        # deque operations are atomic, so queuing takes no lock; it only
+        # guards starting the thread.
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, span, finish_time):
+        '''
+        Queues the span to be finished with the given finish time.
+        '''
+        if len(self._queue) >= self.max_queue_size:
+            if self.drop_policy == 'finish_inline':
+                self._finish(span, finish_time)
+                return
+
+            if self.drop_policy == 'drop_newest':
+                self.dropped += 1
+                return
+            self._drop_oldest()
+
+        self._queue.append((span, finish_time))
+        self._wake()
+
+    def _drop_oldest(self):
+        # flush() and close() wait on their markers; keep them.
+        markers = []
+        while True:
+            try:
+                item = self._queue.popleft()
+            except IndexError:
+                # the thread emptied the queue meanwhile.
+                break
+
+            if item[0] is None or item[0] is _STOP:
+                markers.append(item)
+            else:
+                self.dropped += 1
+                break
+
+        for item in reversed(markers):
+            self._queue.appendleft(item)
+
+    def flush(self, timeout=None):
+        '''
+        Waits until the spans queued so far are finished.
+        Returns False if the timeout expired first.
+        '''
+        done = threading.Event()
+        self._queue.append((None, done))
+        self._wake()
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        '''
+        Finishes the queued spans and stops the background thread.
+        '''
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._pid = None
+        if thread is None:
+            return
+
+        self._queue.append((_STOP, None))
+        self._wakeup.set()
+        thread.join(timeout)
+
+    def _wake(self):
+        # the thread does not survive a fork, start one in the child.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run,
+                                        name='django_opentracing-finisher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        queue = self._queue
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while queue:
+                try:
+                    span, finish_time = queue.popleft()
+                except IndexError:
+                    break
+
+                if span is _STOP:
+                    return
+                elif span is None:
+                    finish_time.set()
+                else:
+                    self._finish(span, finish_time)
+
+    def _finish(self, span, finish_time):
+        try:
+            span.finish(finish_time=finish_time)
+        except Exception:
+            pass
+
+        self.finished += 1
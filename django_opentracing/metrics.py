@@ -0,0 +1,241 @@
+'''
+Rate, errors and duration (RED) metrics of the requests, sampled or not,
+by operation name, aggregated in process from the times also given to the
+request spans, so that no other middleware times the requests again.
+'''
+import threading
+
+from django.http import HttpResponse
+
+# sub-buckets per power of two of the histograms: durations are recorded
+# with a relative error below 1 / 2 ** (_SUB_BUCKET_BITS - 1).
+_SUB_BUCKET_BITS = 5
+_HALF_BUCKETS = 1 << (_SUB_BUCKET_BITS - 1)
+
+# the quantiles exposed by metrics_view().
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _bucket_index(value):
+    shift = max(value.bit_length() - _SUB_BUCKET_BITS, 0)
+    return (shift * _HALF_BUCKETS) + (value >> shift)
+
+
+def _bucket_bounds(index):
+    if index < 2 * _HALF_BUCKETS:
+        return index, index + 1
+
+    shift = index // _HALF_BUCKETS - 1
+    mantissa = index - shift * _HALF_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram(object):
+    '''
+    Log-linear histogram of durations in microseconds, in the manner of
+    HdrHistogram: buckets are linear within each power of two, so that
+    its size only grows with the logarithm of the range of durations.
+    '''
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in list(other.counts.items()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile):
+        '''
+        Returns the duration (in microseconds) under which percentile
+        (between 0 and 100) of the recorded ones fall, or 0 if none was.
+        '''
+        if not self.count:
+            return 0
+
+        rank = max(percentile / 100.0 * self.count, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_bounds(index)[1] - 1, self.max)
+        return self.max
+
+
+class OperationMetrics(object):
+    '''
+    The number of requests of an operation, how many failed, and the
+    histogram of their durations.
+    '''
+    __slots__ = ('requests', 'errors', 'durations')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.durations = Histogram()
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.durations.merge(other.durations)
+
+
+def _merge(target, shard):
+    for operation_name, metrics in list(shard.items()):
+        merged = target.get(operation_name)
+        if merged is None:
+            merged = target[operation_name] = OperationMetrics()
+        merged.merge(metrics)
+
+
+class RequestMetrics(object):
+    '''
+    Aggregates the requests handled by DjangoTracing by operation name.
+    Every thread records in its own shard, without taking a lock, and the
+    shards are merged when the metrics are read; the shards of the
+    threads that ended are folded into a single one then.
+    @param callback called with the snapshot() of the metrics every
+    interval seconds, from the thread finishing a request
+    @param interval the number of seconds between calls to callback
+    '''
+    def __init__(self, callback=None, interval=60):
+        self.callback = callback
+        self.interval = interval
+
+        self._local = threading.local()
+        # (thread, shard) of the threads that recorded requests.
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._next_report = None
+
+    def record(self, operation_name, start_time, finish_time, error=False):
+        '''
+        Records a request.
+        @param start_time when it started, in seconds
+        @param finish_time when it finished, in seconds
+        @param error whether the request failed
+        '''
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+
+        metrics = shard.get(operation_name)
+        if metrics is None:
+            metrics = shard[operation_name] = OperationMetrics()
+        metrics.requests += 1
+        if error:
+            metrics.errors += 1
+        # the clock may have gone back in between.
+        metrics.durations.record(
+            max(int((finish_time - start_time) * 1000000), 0)
+        )
+
+        if self.callback is not None:
+            self._maybe_report(finish_time)
+
+    def _maybe_report(self, now):
+        if self._next_report is None:
+            self._next_report = now + self.interval
+            return
+        if now < self._next_report:
+            return
+
+        with self._lock:
+            if now < self._next_report:
+                return
+            self._next_report = now + self.interval
+
+        self.callback(self.snapshot())
+
+    def snapshot(self):
+        '''
+        Returns a dict of operation names to the OperationMetrics of
+        their requests since the process started. As the shards are read
+        while other threads record requests, the latest of them may be
+        left out.
+        '''
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    _merge(self._retired, shard)
+            self._shards = live
+
+            metrics = {}
+            _merge(metrics, self._retired)
+            for thread, shard in live:
+                _merge(metrics, shard)
+        return metrics
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def render_metrics(metrics):
+    '''
+    Renders a snapshot() in the Prometheus text format.
+    '''
+    lines = [
+        '# TYPE django_requests_total counter',
+        '# TYPE django_request_errors_total counter',
+        '# TYPE django_request_duration_seconds summary',
+    ]
+    for operation_name in sorted(metrics):
+        operation = metrics[operation_name]
+        label = 'operation="%s"' % _escape(operation_name)
+        lines.append('django_requests_total{%s} %d' %
+                     (label, operation.requests))
+        lines.append('django_request_errors_total{%s} %d' %
+                     (label, operation.errors))
+        for quantile in QUANTILES:
+            lines.append(
+                'django_request_duration_seconds{%s,quantile="%s"} %.6f' %
+                (label, quantile,
+                 operation.durations.percentile(quantile * 100) / 1e6)
+            )
+        lines.append('django_request_duration_seconds_sum{%s} %.6f' %
+                     (label, operation.durations.total / 1e6))
+        lines.append('django_request_duration_seconds_count{%s} %d' %
+                     (label, operation.durations.count))
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    '''
+    View exposing the metrics of the OPENTRACING_TRACING setting to
+    Prometheus. Add it to the URL configuration, ideally along with
+    OPENTRACING_EXCLUDED_PATHS so that scrapes are not traced:
+
+        url(r'^metrics$', metrics_view)
+    '''
+    from django.conf import settings
+
+    metrics = settings.OPENTRACING_TRACING.metrics
+    if metrics is None:
+        return HttpResponse('metrics are not enabled\n', status=404,
+                            content_type='text/plain')
+
+    return HttpResponse(render_metrics(metrics.snapshot()),
+                        content_type='text/plain; version=0.0.4')
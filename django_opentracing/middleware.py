@@ -1,6 +1,30 @@
+from contextlib import contextmanager
+import time
+import warnings
+import weakref
+
+import django
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.module_loading import import_string
+import six
 
+from .cache import install_cache_tracing
+from .cache import start_cache_collection
+from .cache import stop_cache_collection
+from .client import install_client_tracing
+from .conf import TracingConfig
+from .db import trace_queries
+from .responses import BreakdownCollector
+from .responses import install_request_timing
+from .scopes import get_scope_manager
+from .switch import install_toggle_signal
+from .templates import install_template_tracing
+from .templates import start_template_collection
+from .templates import stop_template_collection
 from .tracing import DjangoTracing
 from .tracing import initialize_global_tracer
 
@@ -12,12 +36,23 @@ except ImportError:
     # https://docs.djangoproject.com/en/1.10/topics/http/middleware/#upgrading-pre-django-1-10-style-middleware
     MiddlewareMixin = object
 
+if six.PY3:
+    from ._async import AsyncMiddlewareMixin, iscoroutinefunction
+else:
+    AsyncMiddlewareMixin = object
+
+    def iscoroutinefunction(func):
+        return False
+
 
-class OpenTracingMiddleware(MiddlewareMixin):
+class OpenTracingMiddleware(AsyncMiddlewareMixin, MiddlewareMixin):
     '''
     __init__() is only called once, no arguments, when the Web server
     responds to the first request
     '''
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response=None):
         '''
         TODO: ANSWER Qs
@@ -27,10 +62,92 @@ class OpenTracingMiddleware(MiddlewareMixin):
           fast if there's no tracer specified
         '''
         self._init_tracing()
+        if not self._config.enabled:
+            # leave the middleware out of the chain altogether; views
+            # decorated with trace() only call through.
+            raise MiddlewareNotUsed('OPENTRACING_ENABLED is False')
+
+        if get_response is None and self._config.instrument:
+            # old-style middleware (MIDDLEWARE_CLASSES) is never called.
+            warnings.warn('OPENTRACING_TRACE_DB, OPENTRACING_TRACE_CACHE and '
+                          'OPENTRACING_TRACE_TEMPLATES require the '
+                          'middleware to be listed in MIDDLEWARE')
+
         self._tracing = settings.OPENTRACING_TRACING
         self.get_response = get_response
+        _instances.add(self)
+
+        # Under ASGI the next handler is a coroutine; switch to the
+        # coroutine hooks so no sync_to_async() hop is needed.
+        self._is_async = iscoroutinefunction(get_response)
+        if self._is_async:
+            self._enable_async_mode()
+
+    def __call__(self, request):
+        if self._is_async:
+            return self.__acall__(request)
+
+        if not self._is_enabled(request):
+            return self.get_response(request)
+
+        if self._config.instrument:
+            with self._instrument(request):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+
+        return self.process_response(request, response)
+
+    def _is_enabled(self, request):
+        '''
+        Whether tracing is on for the request, after checking
+        OPENTRACING_DISABLED_FILE. Read once per request, so that turning
+        tracing off while it is handled does not leave its span open.
+        '''
+        if self._config.disabled_file is not None:
+            self._config.disabled_file.check(self._tracing)
+        enabled = request._opentracing_enabled = self._tracing._enabled
+        return enabled
+
+    @contextmanager
+    def _instrument(self, request, is_async=False):
+        '''
+        Collects what happens in the database, cache and template layers
+        while the rest of the middleware chain handles the request.
+        '''
+        config = self._config
+        cache_token = None
+        if config.trace_cache:
+            collector, cache_token = start_cache_collection()
+            self._tracing._add_collector(request, collector)
+
+        template_token = None
+        if config.trace_templates:
+            collector, template_token = start_template_collection(
+                self._tracing, request, config.template_max_spans
+            )
+            self._tracing._add_collector(request, collector)
+
+        try:
+            # connections are per thread, so queries can only be traced
+            # when the view runs in this thread.
+            if config.trace_db and not is_async:
+                with trace_queries(self._tracing, request, config.db_aliases,
+                                   config.db_slow_query_ms):
+                    yield
+            else:
+                yield
+        finally:
+            if template_token is not None:
+                stop_template_collection(template_token)
+            if cache_token is not None:
+                stop_cache_collection(cache_token)
 
     def _init_tracing(self):
+        scope_manager = get_scope_manager(
+            getattr(settings, 'OPENTRACING_SCOPE_MANAGER', None)
+        )
+
         if getattr(settings, 'OPENTRACING_TRACER', None) is not None:
             # Backwards compatibility.
             tracing = settings.OPENTRACING_TRACER
@@ -46,18 +163,23 @@ class OpenTracingMiddleware(MiddlewareMixin):
             if not callable(tracer_callable):
                 tracer_callable = import_string(tracer_callable)
 
+            if scope_manager is not None:
+                # the tracer is created with the chosen scope manager.
+                if isinstance(scope_manager, type):
+                    scope_manager = scope_manager()
+                tracer_parameters = dict(tracer_parameters,
+                                         scope_manager=scope_manager)
+
             tracer = tracer_callable(**tracer_parameters)
             tracing = DjangoTracing(tracer)
         else:
             # Rely on the global Tracer.
             tracing = DjangoTracing()
 
-        # trace_all defaults to True when used as middleware.
-        tracing._trace_all = getattr(settings, 'OPENTRACING_TRACE_ALL', True)
+        _check_scope_manager(tracing, scope_manager)
 
-        # set the start_span_cb hook, if any.
-        tracing._start_span_cb = getattr(settings, 'OPENTRACING_START_SPAN_CB',
-                                         None)
+        # resolve the per-request options once.
+        self._load_config(tracing)
 
         # Normalize the tracing field in settings, including the old field.
         settings.OPENTRACING_TRACING = tracing
@@ -67,19 +189,63 @@ class OpenTracingMiddleware(MiddlewareMixin):
         if getattr(settings, 'OPENTRACING_SET_GLOBAL_TRACER', False):
             initialize_global_tracer(tracing)
 
+    def _load_config(self, tracing):
+        self._config = TracingConfig.from_settings()
+        self._config.apply(tracing)
+        if not self._config.enabled:
+            # the middleware is not used, leave the libraries alone.
+            return
+
+        if self._config.trace_db and django.VERSION < (2, 0):
+            raise ImproperlyConfigured('OPENTRACING_TRACE_DB requires '
+                                       'Django >= 2.0')
+        if self._config.trace_cache:
+            install_cache_tracing(self._config.cache_aliases)
+        if self._config.trace_templates:
+            install_template_tracing()
+        if self._config.trace_client:
+            install_client_tracing(tracing)
+        if self._config.trace_breakdown:
+            install_request_timing()
+        if self._config.toggle_signal is not None:
+            install_toggle_signal(tracing, self._config.toggle_signal)
+
+    def _reload_config(self):
+        self._load_config(self._tracing)
+
     def process_view(self, request, view_func, view_args, view_kwargs):
+        return self._process_view(request, view_func, view_args, view_kwargs)
+
+    def _process_view(self, request, view_func, view_args, view_kwargs):
         # determine whether this middleware should be applied
         # NOTE: if tracing is on but not tracing all requests, then the tracing
         # occurs through decorator functions rather than middleware
-        if not self._tracing._trace_all:
+        config = self._config
+        if not config.trace_all:
+            return None
+        # the hooks are called without __call__() by old-style middleware.
+        enabled = getattr(request, '_opentracing_enabled', None)
+        if enabled is None:
+            enabled = self._tracing._enabled
+        if not enabled:
             return None
 
-        if hasattr(settings, 'OPENTRACING_TRACED_ATTRIBUTES'):
-            traced_attributes = getattr(settings,
-                                        'OPENTRACING_TRACED_ATTRIBUTES')
-        else:
-            traced_attributes = []
-        self._tracing._apply_tracing(request, view_func, traced_attributes)
+        if config.excluded_paths is not None and \
+                config.excluded_paths.match(request.path):
+            return None
+
+        route = self._tracing._get_route(request, view_func)
+        if route is not None and route.trace is False:
+            return None
+
+        view_time = time.time() if config.trace_breakdown else None
+        scope = self._tracing._apply_tracing(request, view_func,
+                                             config.attribute_extractors,
+                                             route)
+        if scope is not None and config.trace_breakdown:
+            self._tracing._add_collector(
+                request, BreakdownCollector(request, view_time)
+            )
 
     def process_exception(self, request, exception):
         self._tracing._finish_tracing(request, error=exception)
@@ -87,3 +253,38 @@ class OpenTracingMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         self._tracing._finish_tracing(request, response=response)
         return response
+
+
+def _check_scope_manager(tracing, scope_manager):
+    '''
+    Checks that the tracer activates spans with the scope manager of the
+    OPENTRACING_SCOPE_MANAGER setting, as it cannot be changed once the
+    tracer is created.
+    '''
+    if scope_manager is None:
+        return
+
+    current = tracing.tracer.scope_manager
+    if isinstance(scope_manager, type):
+        matches = isinstance(current, scope_manager)
+    else:
+        matches = current is scope_manager
+    if not matches:
+        raise ImproperlyConfigured(
+            'OPENTRACING_SCOPE_MANAGER is %r, but the tracer uses %r; '
+            'create the tracer with it, or set '
+            'OPENTRACING_TRACER_CALLABLE instead' % (scope_manager, current)
+        )
+
+
+# live middleware instances, refreshed when settings are overridden.
+_instances = weakref.WeakSet()
+
+
+@receiver(setting_changed)
+def _update_config(setting, **kwargs):
+    if not setting.startswith('OPENTRACING_'):
+        return
+
+    for middleware in list(_instances):
+        middleware._reload_config()
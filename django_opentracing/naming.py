@@ -0,0 +1,91 @@
+import functools
+import re
+
+STRATEGIES = ('function', 'qualname', 'view_name', 'route')
+
+# anchors of regex-based routes, e.g. '^articles/$'.
+_ROUTE_ANCHORS = re.compile(r'(?<!\\)[\^$]')
+
+# the maximum number of operation names memoized.
+MAX_NAMES = 1000
+
+
+def _view_key(view_func):
+    '''
+    Returns the function identifying a view, the same for all requests:
+    method_decorator() hands a new partial of the bound method to the
+    decorators for every request.
+    '''
+    if isinstance(view_func, functools.partial):
+        view_func = view_func.func
+        view_func = getattr(view_func, '__func__', view_func)
+    return view_func
+
+
+class OperationNameResolver(object):
+    '''
+    Computes the operation name of request spans, memoized per view
+    and route so that it is a dictionary hit for every request but the
+    first one.
+    @param strategy one of:
+      'function': the name of the view function (the default),
+      'qualname': the dotted path of the view function, or of its class
+      for class-based views,
+      'view_name': the URL name of the view, including its namespace,
+      'route': the URL route matched by the request,
+    or a callable taking the request and the view function, which is
+    not memoized. At most MAX_NAMES names are memoized.
+    '''
+    def __init__(self, strategy='function'):
+        if not callable(strategy) and strategy not in STRATEGIES:
+            raise ValueError('unknown operation name strategy: %r' %
+                             (strategy,))
+
+        self.strategy = strategy
+        self._names = {}
+
+    def __call__(self, request, view_func):
+        strategy = self.strategy
+        if callable(strategy):
+            return strategy(request, view_func)
+
+        view_func = _view_key(view_func)
+        match = getattr(request, 'resolver_match', None)
+        if strategy == 'route':
+            key = (view_func, getattr(match, 'route', None))
+        elif strategy == 'view_name':
+            key = (view_func, getattr(match, 'view_name', None))
+        else:
+            key = (view_func, None)
+
+        try:
+            return self._names[key]
+        except KeyError:
+            name = self._resolve(view_func, key[1])
+            if len(self._names) < MAX_NAMES:
+                self._names[key] = name
+            return name
+
+    def _resolve(self, view_func, match_key):
+        strategy = self.strategy
+        if strategy == 'function':
+            return view_func.__name__
+
+        if match_key:
+            if strategy == 'route':
+                return _ROUTE_ANCHORS.sub('', match_key)
+            return match_key
+
+        # no URL name or route, e.g. for views called from the decorator
+        # outside of URL resolution.
+        return _qualname(view_func)
+
+
+def _qualname(view_func):
+    view = getattr(view_func, 'view_class', view_func)
+    name = getattr(view, '__qualname__', None) or view.__name__
+    module = getattr(view, '__module__', None)
+    if module is None:
+        return name
+
+    return '%s.%s' % (module, name)
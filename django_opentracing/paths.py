@@ -0,0 +1,57 @@
+import fnmatch
+import re
+
+_GLOB_CHARS = ('*', '?', '[')
+
+
+class PathMatcher(object):
+    '''
+    Matches request paths against a list of patterns, compiled once:
+    plain strings are path prefixes, strings containing glob characters
+    (*, ? or [) are shell-style globs, and compiled regular expressions
+    are matched from the start of the path.
+
+    Prefixes are checked with a single str.startswith() call, and globs
+    with a single combined regular expression. Compiled regular
+    expressions are matched one by one, as they may have flags or group
+    names that cannot be combined.
+    '''
+    def __init__(self, patterns):
+        prefixes = []
+        globs = []
+        regexes = []
+        for pattern in patterns:
+            if hasattr(pattern, 'pattern'):
+                regexes.append(pattern)
+            elif any(c in pattern for c in _GLOB_CHARS):
+                globs.append(fnmatch.translate(pattern))
+            else:
+                prefixes.append(pattern)
+
+        self._prefixes = tuple(prefixes)
+        self._regexes = tuple(regexes)
+        self._regex = None
+        if globs:
+            self._regex = re.compile('|'.join('(?:%s)' % g for g in globs))
+
+    def __bool__(self):
+        return bool(self._prefixes) or self._regex is not None or \
+            bool(self._regexes)
+
+    __nonzero__ = __bool__
+
+    def match(self, path):
+        '''
+        @param path the request path
+        Returns whether the path matches any of the patterns
+        '''
+        if self._prefixes and path.startswith(self._prefixes):
+            return True
+
+        if self._regex is not None and self._regex.match(path) is not None:
+            return True
+
+        for regex in self._regexes:
+            if regex.match(path) is not None:
+                return True
+        return False
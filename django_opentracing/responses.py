@@ -0,0 +1,176 @@
+'''
+Follows the bodies of streaming responses, so that the span of their
+request covers the time spent sending them, and the size and timing
+breakdown of the requests: the time spent before the view (in the
+middleware above), the request and response sizes, and for streaming
+responses, the time to the first byte of the body and the total time.
+'''
+import time
+
+from django.core.signals import request_started
+
+# where the request start time is kept, in the WSGI environ or ASGI scope,
+# as the request does not exist yet when Django starts handling it.
+_STARTED_KEY = 'django_opentracing.started'
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _record_start(sender, environ=None, scope=None, **kwargs):
+    carrier = environ if environ is not None else scope
+    if carrier is not None:
+        carrier[_STARTED_KEY] = time.time()
+
+
+def install_request_timing():
+    '''
+    Records when Django starts handling every request, before any
+    middleware runs.
+    '''
+    request_started.connect(_record_start,
+                            dispatch_uid='django_opentracing.responses')
+
+
+def take_start_time(request):
+    '''
+    Moves when Django started handling the request onto it, out of its
+    META (or ASGI scope), where it would be traced along with the other
+    entries. Returns it, or None if unknown.
+    '''
+    # ASGI requests are built from the scope, WSGI ones keep the environ.
+    started = None
+    scope = getattr(request, 'scope', None)
+    if scope is not None:
+        started = scope.pop(_STARTED_KEY, None)
+    started = request.META.pop(_STARTED_KEY, started)
+
+    request._opentracing_started = started
+    return started
+
+
+def get_start_time(request):
+    '''
+    Returns when Django started handling the request, or None if unknown.
+    '''
+    try:
+        return request._opentracing_started
+    except AttributeError:
+        return take_start_time(request)
+
+
+def get_content_length(request):
+    '''
+    Returns the length of the request body, or None if unknown.
+    '''
+    try:
+        return int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        return None
+
+
+class BreakdownCollector(object):
+    '''
+    Tags the request span with the request body length, and the time
+    spent before the view is called.
+    @param request the HttpRequest being handled
+    @param view_time when the view was about to be called
+    '''
+    def __init__(self, request, view_time):
+        self.request = request
+        self.view_time = view_time
+
+    def finish(self, span):
+        length = get_content_length(self.request)
+        if length is not None:
+            span.set_tag('http.request_content_length', length)
+
+        start_time = get_start_time(self.request)
+        if start_time is not None:
+            span.set_tag('http.pre_view_ms',
+                         _ms(self.view_time - start_time))
+
+
+class ResponseStream(object):
+    '''
+    Follows the consumption of the body of a streaming response, without
+    buffering it: the chunks are counted as they are sent, and callback
+    is called with this object once the body is exhausted or the
+    response closed, whichever comes first.
+    @param response the streaming response
+    @param callback called when the body has been sent
+    '''
+    def __init__(self, response, callback):
+        self.callback = callback
+        self.bytes_sent = 0
+        self.start_time = time.time()
+        self.first_byte_time = None
+        self.finish_time = None
+        self.iterated = False
+        self.exhausted = False
+        self._content_length = response.get('Content-Length')
+
+        # setting the content of a FileResponse drops its file, which
+        # servers send with wsgi.file_wrapper (e.g. sendfile) instead of
+        # iterating over the response; only follow when it is closed.
+        if getattr(response, 'file_to_stream', None) is None:
+            if getattr(response, 'is_async', False):
+                # Django >= 4.2 streams async iterators under ASGI.
+                from ._async_stream import iterate_stream
+                content = iterate_stream(self, response.streaming_content)
+            else:
+                content = self._iterate(response.streaming_content)
+            response.streaming_content = content
+
+        self._close = response.close
+        # overriding the method on the instance also covers the servers
+        # closing the response without iterating over it.
+        response.close = self.close
+
+    @property
+    def aborted(self):
+        '''
+        Whether the response was closed before its body was exhausted.
+        '''
+        return self.iterated and not self.exhausted
+
+    def get_length(self):
+        '''
+        Returns the number of bytes of the body sent, or the length of the
+        body when the server sent it without iterating over it.
+        '''
+        if self.iterated or self._content_length is None:
+            return self.bytes_sent
+
+        try:
+            return int(self._content_length)
+        except ValueError:
+            return self.bytes_sent
+
+    def _iterate(self, content):
+        for chunk in content:
+            self._record(chunk)
+            yield chunk
+
+        self.exhausted = True
+        self._finish()
+
+    def _record(self, chunk):
+        if self.first_byte_time is None:
+            self.iterated = True
+            self.first_byte_time = time.time()
+        self.bytes_sent += len(chunk)
+
+    def close(self):
+        try:
+            self._close()
+        finally:
+            self._finish()
+
+    def _finish(self):
+        if self.finish_time is not None:
+            return
+
+        self.finish_time = time.time()
+        self.callback(self)
@@ -0,0 +1,146 @@
+from collections import namedtuple
+
+from django.utils.module_loading import import_string
+import six
+
+from .attributes import compile_attributes
+from .cache import CacheCollector
+from .db import QueryCollector
+from .naming import _qualname
+from .templates import TemplateCollector
+
+OPTIONS = (
+    'trace',
+    'sampler',
+    'traced_attributes',
+    'start_span_cb',
+    'trace_db',
+    'db_slow_query_ms',
+    'trace_cache',
+    'trace_templates',
+    'template_max_spans',
+    'slow_ms',
+)
+
+
+def trace_options(**options):
+    '''
+    View decorator setting the tracing options of the view, overriding
+    the OPENTRACING_* settings for its requests; the OPENTRACING_ROUTES
+    setting takes precedence over it. For example:
+
+        @trace_options(sampler=ProbabilisticSampler(0.01), trace_db=False)
+        def health(request):
+            ...
+
+    @param options any of OPTIONS
+    '''
+    _check_options(options)
+
+    def decorator(view_func):
+        view_func._opentracing_options = options
+        return view_func
+
+    return decorator
+
+
+def _route_view(view_func, traced_view, wrapper):
+    '''
+    Returns the view the route options of a view decorated with trace()
+    are looked up on: the wrapper, which keeps the options given to
+    trace_options() below trace() and gets those given above it, or the
+    method decorated by method_decorator(), as its wrapper is created
+    again for every request.
+    '''
+    return wrapper if traced_view is view_func else traced_view
+
+
+def _check_options(options):
+    for name in options:
+        if name not in OPTIONS:
+            raise ValueError('unknown route option: %r' % (name,))
+
+
+class RouteOptions(namedtuple('RouteOptions', OPTIONS)):
+    '''
+    The tracing options of a view, resolved once; None stands for the
+    value of the corresponding setting. traced_attributes holds the
+    compiled AttributeExtractors.
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def from_options(cls, options):
+        options = dict(options)
+        sampler = options.get('sampler')
+        if isinstance(sampler, six.string_types):
+            options['sampler'] = import_string(sampler)
+
+        attributes = options.get('traced_attributes')
+        if attributes is not None:
+            options['traced_attributes'] = compile_attributes(attributes)
+
+        return cls(*[options.get(name) for name in OPTIONS])
+
+    def configure_collectors(self, collectors):
+        '''
+        Turns off, or reconfigures, the collectors that the middleware
+        started before the view was known.
+        '''
+        for collector in collectors:
+            if isinstance(collector, QueryCollector):
+                if self.trace_db is False:
+                    collector.active = False
+                elif self.db_slow_query_ms is not None:
+                    collector.slow_query_ms = self.db_slow_query_ms
+            elif isinstance(collector, CacheCollector):
+                if self.trace_cache is False:
+                    collector.active = False
+            elif isinstance(collector, TemplateCollector):
+                if self.trace_templates is False:
+                    collector.active = False
+                elif self.template_max_spans is not None:
+                    collector.max_spans = self.template_max_spans
+
+
+class RouteRegistry(object):
+    '''
+    Resolves the tracing options of views, from the trace_options()
+    decorator and the OPENTRACING_ROUTES setting, once per view and URL
+    name, so that finding them is a dictionary hit for every request but
+    the first one.
+    @param routes a dict of URL names (including their namespace) or
+    dotted paths of views to dicts of options; URL names take precedence
+    '''
+    def __init__(self, routes=None):
+        self._routes = {}
+        for route, options in (routes or {}).items():
+            _check_options(options)
+            self._routes[route] = options
+
+        self._resolved = {}
+
+    def get(self, request, view_func):
+        '''
+        Returns the RouteOptions of the view, or None if it has none.
+        '''
+        match = getattr(request, 'resolver_match', None)
+        key = (view_func, getattr(match, 'view_name', None))
+        try:
+            return self._resolved[key]
+        except KeyError:
+            route = self._resolved[key] = self._resolve(*key)
+            return route
+
+    def _resolve(self, view_func, view_name):
+        options = {}
+        options.update(getattr(view_func, '_opentracing_options', {}))
+        if self._routes:
+            options.update(self._routes.get(_qualname(view_func), {}))
+            if view_name is not None:
+                options.update(self._routes.get(view_name, {}))
+
+        if not options:
+            return None
+
+        return RouteOptions.from_options(options)
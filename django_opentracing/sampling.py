@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import random
+import threading
+import time
+
+from .naming import _view_key
+
+_now = getattr(time, 'monotonic', time.time)
+
+# the maximum number of views RateLimitingSampler keeps a bucket for.
+MAX_BUCKETS = 1000
+
+
+class Sampler(object):
+    '''
+    Base class for head samplers. A sampler decides whether a request
+    gets traced before its span is created, so unsampled requests skip
+    span creation, tagging and header extraction.
+    '''
+    # set to True to receive the extracted upstream span context.
+    uses_parent_context = False
+
+    def is_sampled(self, request, view_func, parent_context=None):
+        '''
+        @param request the HttpRequest being handled
+        @param view_func the view function about to be run
+        @param parent_context the upstream span context, if any
+        (only extracted when uses_parent_context is True)
+        Returns whether the request should be traced
+        '''
+        raise NotImplementedError()
+
+
+class ProbabilisticSampler(Sampler):
+    '''
+    @param rate the probability (between 0 and 1) of tracing a request
+    '''
+    def __init__(self, rate):
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError('rate must be between 0 and 1')
+
+        self.rate = rate
+
+    def is_sampled(self, request, view_func, parent_context=None):
+        return random.random() < self.rate
+
+
+class RateLimitingSampler(Sampler):
+    '''
+    Token-bucket sampler, with one bucket per view, for up to MAX_BUCKETS
+    views; past them, the oldest bucket is dropped.
+    @param max_per_second the number of requests traced per second and view
+    @param burst the size of each bucket, defaults to max_per_second
+    '''
+    def __init__(self, max_per_second, burst=None):
+        if max_per_second <= 0:
+            raise ValueError('max_per_second must be positive')
+
+        self.max_per_second = float(max_per_second)
+        self.burst = float(burst if burst is not None else max_per_second)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_sampled(self, request, view_func, parent_context=None):
+        view_func = _view_key(view_func)
+        now = _now()
+        with self._lock:
+            bucket = self._buckets.get(view_func)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+                tokens = self.burst
+            else:
+                tokens, last = bucket
+                tokens = min(self.burst,
+                             tokens + (now - last) * self.max_per_second)
+
+            sampled = tokens >= 1.0
+            if sampled:
+                tokens -= 1.0
+
+            self._buckets[view_func] = (tokens, now)
+
+        return sampled
+
+
+class ParentBasedSampler(Sampler):
+    '''
+    Follows the decision of the upstream service when the request
+    carries a span context, and delegates to another sampler otherwise.
+    @param root the sampler used for requests without an upstream
+    context; if None, those requests are always traced
+    '''
+    uses_parent_context = True
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def is_sampled(self, request, view_func, parent_context=None):
+        if parent_context is not None:
+            sampled = _is_context_sampled(parent_context)
+            return True if sampled is None else sampled
+
+        if self.root is None:
+            return True
+
+        return self.root.is_sampled(request, view_func, None)
+
+
+def _is_context_sampled(span_context):
+    '''
+    Returns the sampling flag carried by a span context, or None when
+    the tracer does not expose one (the OpenTracing API does not
+    define it).
+    '''
+    is_sampled = getattr(span_context, 'is_sampled', None)
+    if callable(is_sampled):
+        return bool(is_sampled())
+
+    sampled = getattr(span_context, 'sampled', None)
+    if sampled is not None:
+        return bool(sampled)
+
+    return None
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import threading
+import time
+import weakref
+
+from django.utils.module_loading import import_string
+import six
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+# the scope managers of opentracing, by the name used to select them in
+# the OPENTRACING_SCOPE_MANAGER setting.
+SCOPE_MANAGERS = {
+    'threadlocal': 'opentracing.scope_managers.ThreadLocalScopeManager',
+    'contextvars': 'opentracing.scope_managers.contextvars.'
+                   'ContextVarsScopeManager',
+    'gevent': 'opentracing.scope_managers.gevent.GeventScopeManager',
+    'asyncio': 'opentracing.scope_managers.asyncio.AsyncioScopeManager',
+}
+
+
+def get_scope_manager(scope_manager):
+    '''
+    Resolves the OPENTRACING_SCOPE_MANAGER setting.
+    @param scope_manager one of the names of SCOPE_MANAGERS, the dotted
+    path to a ScopeManager class, or a ScopeManager instance
+    @return the ScopeManager class, or the instance
+    '''
+    if not isinstance(scope_manager, six.string_types):
+        return scope_manager
+
+    path = SCOPE_MANAGERS.get(scope_manager, scope_manager)
+    if '.' not in path:
+        raise ValueError('unknown scope manager: %r' % (scope_manager,))
+    return import_string(path)
+
+
+class ScopeRegistry(object):
+    '''
+    Keeps the scope of every request being traced. Requests are only
+    weakly referenced, so a request that never reaches process_response
+    does not keep itself, its scope and its span alive: its span is
+    finished when the request is garbage collected, or earlier when
+    the registry is full or the scope is older than max_age.
+    @param max_scopes the maximum number of scopes kept, the oldest
+    scope being reaped to make room for a new one
+    @param max_age the number of seconds after which a scope is
+    considered stale and reaped
+    '''
+    def __init__(self, max_scopes=None, max_age=None):
+        self.max_scopes = max_scopes
+        self.max_age = max_age
+        self.reaped = 0
+
+        # keyed by id(request), oldest first.
+        self._entries = OrderedDict()
+        # an RLock, as garbage collection may run _discard() while
+        # the current thread already holds it.
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __setitem__(self, request, scope):
+        key = id(request)
+
+        def discard(ref):
+            self._discard(key, ref)
+
+        with self._lock:
+            now = _now()
+            self._reap_stale(now)
+            if self.max_scopes is not None:
+                while self._entries and len(self._entries) >= self.max_scopes:
+                    _, entry = self._entries.popitem(last=False)
+                    self._reap(entry, 'too many in-flight requests')
+
+            self._entries.pop(key, None)
+            self._entries[key] = (weakref.ref(request, discard), scope, now)
+
+    def get(self, request, default=None):
+        entry = self._entries.get(id(request))
+        if entry is None or entry[0]() is not request:
+            return default
+
+        return entry[1]
+
+    def pop(self, request, default=None):
+        key = id(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0]() is not request:
+                return default
+
+            del self._entries[key]
+            return entry[1]
+
+    def reap(self):
+        '''
+        Finishes the spans of the stale scopes.
+        '''
+        with self._lock:
+            self._reap_stale(_now())
+
+    def _reap_stale(self, now):
+        if self.max_age is None:
+            return
+
+        # entries are ordered by start time, so only the oldest ones
+        # need to be checked.
+        deadline = now - self.max_age
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[2] > deadline:
+                break
+
+            del self._entries[key]
+            self._reap(entry, 'scope is stale')
+
+    def _discard(self, key, ref):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not ref:
+                return
+
+            del self._entries[key]
+            self._reap(entry, 'request was garbage collected')
+
+    def _reap(self, entry, reason):
+        self.reaped += 1
+
+        # The scope cannot be closed from here, as this may not be the
+        # thread that activated it, so only finish the span.
+        span = entry[1].span
+        span.log_kv({
+            'event': 'reaped',
+            'message': reason,
+        })
+        span.finish()
@@ -0,0 +1,68 @@
+'''
+Ways to turn tracing off and back on in a running process, without
+restarting it: a POSIX signal, and the presence of a file.
+'''
+import os
+import signal
+import time
+import warnings
+
+import six
+
+try:
+    _now = time.monotonic
+except AttributeError:
+    # Python 2
+    _now = time.time
+
+
+def install_toggle_signal(tracing, signum):
+    '''
+    Flips tracing on and off every time the process receives the signal.
+    @param tracing the DjangoTracing to turn on and off
+    @param signum the signal number or name, e.g. 'SIGUSR2'
+    '''
+    if isinstance(signum, six.string_types):
+        signum = getattr(signal, signum)
+
+    def toggle(signum, frame):
+        tracing.enabled = not tracing.enabled
+
+    try:
+        signal.signal(signum, toggle)
+    except ValueError:
+        # handlers can only be installed from the main thread, which is
+        # not where the development server loads the middleware.
+        warnings.warn('OPENTRACING_TOGGLE_SIGNAL is only installed when '
+                      'the middleware is loaded from the main thread')
+
+
+class FileSwitch(object):
+    '''
+    Disables tracing while a file exists, e.g. one touched by an operator
+    during an incident. The file is looked up at most once per interval,
+    and only a change of its presence turns tracing on or off, so the
+    other ways of toggling it are not overridden.
+    @param path the path of the file
+    @param interval the minimum number of seconds between lookups
+    '''
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._exists = None
+        self._next_check = 0
+
+    def check(self, tracing):
+        '''
+        Turns tracing off or on if the file appeared or disappeared since
+        the last check.
+        '''
+        now = _now()
+        if now < self._next_check:
+            return
+
+        self._next_check = now + self.interval
+        exists = os.path.exists(self.path)
+        if exists != self._exists:
+            self._exists = exists
+            tracing.enabled = not exists
@@ -0,0 +1,272 @@
+'''
+Tail-based sampling: the spans of a request are buffered until the
+request span finishes, and only reported if the request turned out to be
+interesting (failed, or slow), while the others are dropped or sampled
+down. Head samplers (see sampling.py) decide before knowing the outcome,
+and so drop the failing and slow requests as often as the others.
+'''
+import random
+import threading
+import time
+
+import opentracing
+from opentracing.ext import tags
+
+
+class TailSampler(object):
+    '''
+    Keeps the traces of the requests that errored, returned a 5xx status
+    code, or took longer than slow_ms, and keep_rate of the others.
+    Buffered spans are bounded: past max_spans in total, or
+    max_spans_per_trace for a request, finished spans are dropped and
+    counted as evicted, and the request span is tagged with
+    sampling.truncated if its trace is kept.
+    @param slow_ms the duration above which a request is kept, which
+    the slow_ms route option overrides per view; None to not keep
+    requests for their duration
+    @param keep_rate the probability (between 0 and 1) of keeping the
+    other requests
+    @param max_spans the maximum number of spans buffered at once
+    @param max_spans_per_trace the maximum number of spans buffered for
+    a request
+    '''
+    def __init__(self, slow_ms=None, keep_rate=0.0, max_spans=10000,
+                 max_spans_per_trace=1000):
+        if not 0.0 <= keep_rate <= 1.0:
+            raise ValueError('keep_rate must be between 0 and 1')
+
+        self.slow_ms = slow_ms
+        self.keep_rate = keep_rate
+        self.max_spans = max_spans
+        self.max_spans_per_trace = max_spans_per_trace
+
+        self.kept = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.buffered = 0
+
+        self._lock = threading.Lock()
+        self._tracer = None
+
+    def get_tracer(self, tracer):
+        '''
+        Returns the tracer wrapping the given one, through which the
+        spans of buffered traces are created.
+        '''
+        wrapper = self._tracer
+        if wrapper is None or wrapper._tracer is not tracer:
+            wrapper = self._tracer = TailSamplingTracer(tracer)
+        return wrapper
+
+    def start_active_span(self, tracer, operation_name, child_of=None,
+                          start_time=None, slow_ms=None):
+        '''
+        Starts the span of a request, opening the buffer of its trace.
+        @param tracer the TailSamplingTracer returned by get_tracer()
+        @param start_time when the request started, by default now
+        @param slow_ms the duration above which the request is kept,
+        overriding the one of the sampler
+        '''
+        if slow_ms is None:
+            slow_ms = self.slow_ms
+
+        if start_time is None:
+            start_time = time.time()
+
+        span = tracer._tracer.start_span(operation_name, child_of=child_of,
+                                         start_time=start_time)
+        buffer = TraceBuffer(self, slow_ms, start_time)
+        return tracer.scope_manager.activate(
+            BufferedSpan(tracer, span, buffer, root=True),
+            finish_on_close=False,
+        )
+
+    def _reserve(self, buffer):
+        with self._lock:
+            if self.buffered >= self.max_spans or \
+                    len(buffer.spans) >= self.max_spans_per_trace:
+                self.evicted += 1
+                return False
+
+            self.buffered += 1
+            return True
+
+    def _release(self, count, kept):
+        with self._lock:
+            self.buffered -= count
+            if kept:
+                self.kept += 1
+            else:
+                self.dropped += 1
+
+
+class TraceBuffer(object):
+    '''
+    The finished spans of a request, and what is known of its outcome.
+    '''
+    def __init__(self, sampler, slow_ms, start_time):
+        self.sampler = sampler
+        self.slow_ms = slow_ms
+        self.start_time = start_time
+        self.spans = []
+        self.error = False
+        self.status_code = None
+        self.truncated = False
+        # None while the request span is not finished.
+        self.kept = None
+
+    def add(self, span, finish_time, deferred=None):
+        if self.kept is not None:
+            # late child span, e.g. of a streaming response.
+            if self.kept:
+                _report(span, finish_time, deferred)
+            return
+
+        if self.sampler._reserve(self):
+            self.spans.append((span, finish_time, deferred))
+        else:
+            self.truncated = True
+
+    def close(self, root, finish_time, deferred=None):
+        self.kept = self._keep(finish_time)
+        spans, self.spans = self.spans, []
+        self.sampler._release(len(spans), self.kept)
+        if not self.kept:
+            return
+
+        if self.truncated:
+            root.set_tag('sampling.truncated', True)
+        for span, span_finish_time, span_deferred in spans:
+            _report(span, span_finish_time, span_deferred)
+        _report(root, finish_time, deferred)
+
+    def _keep(self, finish_time):
+        if self.error:
+            return True
+        if self.status_code is not None and self.status_code >= 500:
+            return True
+        if self.slow_ms is not None and \
+                (finish_time - self.start_time) * 1000 >= self.slow_ms:
+            return True
+
+        return random.random() < self.sampler.keep_rate
+
+
+def _report(span, finish_time, deferred):
+    if deferred is not None:
+        for func, args in deferred:
+            try:
+                func(span, *args)
+            except Exception:
+                pass
+    span.finish(finish_time=finish_time)
+
+
+class BufferedSpan(opentracing.Span):
+    '''
+    Span of a buffered trace: its finish is deferred until the request
+    span finishes, and the sampler decides whether to keep the trace.
+    '''
+    def __init__(self, tracer, span, buffer, root=False):
+        super(BufferedSpan, self).__init__(tracer, span.context)
+        self._span = span
+        self._buffer = buffer
+        self._root = root
+        self._deferred = None
+
+    @property
+    def context(self):
+        return self._span.context
+
+    def set_operation_name(self, operation_name):
+        self._span.set_operation_name(operation_name)
+        return self
+
+    def set_tag(self, key, value):
+        if key == tags.ERROR and value:
+            self._buffer.error = True
+        elif key == tags.HTTP_STATUS_CODE and self._root:
+            self._buffer.status_code = value
+
+        self._span.set_tag(key, value)
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        self._span.log_kv(key_values, timestamp)
+        return self
+
+    def set_baggage_item(self, key, value):
+        self._span.set_baggage_item(key, value)
+        return self
+
+    def get_baggage_item(self, key):
+        return self._span.get_baggage_item(key)
+
+    def defer(self, func, *args):
+        '''
+        Calls func(span, *args) with the wrapped span right before it is
+        reported, to set tags that are only worth computing if the trace
+        is kept.
+        '''
+        if self._deferred is None:
+            self._deferred = []
+        self._deferred.append((func, args))
+
+    def finish(self, finish_time=None):
+        if finish_time is None:
+            finish_time = time.time()
+
+        if self._root:
+            self._buffer.close(self._span, finish_time, self._deferred)
+        else:
+            self._buffer.add(self._span, finish_time, self._deferred)
+
+
+class TailSamplingTracer(opentracing.Tracer):
+    '''
+    Tracer creating the children of buffered spans as buffered spans,
+    and delegating anything else to the wrapped tracer.
+    '''
+    def __init__(self, tracer):
+        super(TailSamplingTracer, self).__init__()
+        self._tracer = tracer
+
+    @property
+    def scope_manager(self):
+        # the one of the wrapped tracer, which may be replaced.
+        return self._tracer.scope_manager
+
+    def start_active_span(self, operation_name, child_of=None,
+                          references=None, tags=None, start_time=None,
+                          ignore_active_span=False, finish_on_close=True):
+        span = self.start_span(operation_name, child_of, references, tags,
+                               start_time, ignore_active_span)
+        return self.scope_manager.activate(span, finish_on_close)
+
+    def start_span(self, operation_name=None, child_of=None,
+                   references=None, tags=None, start_time=None,
+                   ignore_active_span=False):
+        parent = child_of
+        if parent is None and references is None and \
+                not ignore_active_span:
+            parent = self.active_span
+
+        if isinstance(parent, BufferedSpan):
+            span = self._tracer.start_span(operation_name, parent._span,
+                                           None, tags, start_time, True)
+            return BufferedSpan(self, span, parent._buffer)
+
+        if isinstance(child_of, BufferedSpan):
+            child_of = child_of._span
+        return self._tracer.start_span(operation_name, child_of, references,
+                                       tags, start_time, ignore_active_span)
+
+    def inject(self, span_context, format, carrier):
+        return self._tracer.inject(span_context, format, carrier)
+
+    def extract(self, format, carrier):
+        return self._tracer.extract(format, carrier)
+
+    def __getattr__(self, name):
+        # tracer specific methods, e.g. MockTracer.finished_spans().
+        return getattr(self._tracer, name)
@@ -0,0 +1,147 @@
+import functools
+import time
+
+from django.template.base import Template
+from opentracing.ext import tags
+
+from .context import RequestLocal
+
+_current = RequestLocal('django_opentracing.templates')
+
+
+class TemplateCollector(object):
+    '''
+    Times the templates rendered while handling a request, including the
+    ones rendered by {% include %}. The first max_spans renders become
+    child spans (nested like the templates), and finish() reports the
+    total and self time of every template on the request span.
+    @param tracing the DjangoTracing tracing the request
+    @param request the HttpRequest being handled
+    @param max_spans the maximum number of template spans per request
+    '''
+    def __init__(self, tracing, request, max_spans=20):
+        self.tracing = tracing
+        self.request = request
+        self.max_spans = max_spans
+        # turned off by the route options of the view.
+        self.active = True
+        self.span_count = 0
+        self.render_count = 0
+        self.render_time = 0.0
+        self.templates = {}
+        # [span, child time] of the templates being rendered.
+        self._stack = []
+
+    def render(self, render, template, context):
+        name = template.name or '<unknown>'
+        span = None
+        start_time = time.time()
+
+        if self.span_count < self.max_spans:
+            parent = self._stack[-1][0] if self._stack else None
+            if parent is None:
+                parent = self.tracing.get_span(self.request)
+            if parent is not None:
+                self.span_count += 1
+                span = self.tracing.tracer.start_span(
+                    operation_name='template.render',
+                    child_of=parent,
+                    start_time=start_time,
+                    tags={
+                        tags.COMPONENT: 'django.template',
+                        'template.name': name,
+                    }
+                )
+
+        frame = [span, 0.0]
+        self._stack.append(frame)
+        try:
+            return render(template, context)
+        except Exception as exc:
+            if span is not None:
+                span.set_tag(tags.ERROR, True)
+                span.log_kv({
+                    'event': tags.ERROR,
+                    'error.object': exc,
+                })
+            raise
+        finally:
+            self._stack.pop()
+            finish_time = time.time()
+            total = finish_time - start_time
+            self_time = total - frame[1]
+            self._record(name, total, self_time)
+
+            if self._stack:
+                self._stack[-1][1] += total
+            else:
+                self.render_time += total
+
+            if span is not None:
+                span.set_tag('template.self_time_ms',
+                             round(self_time * 1000, 3))
+                span.finish(finish_time=finish_time)
+
+    def _record(self, name, total, self_time):
+        self.render_count += 1
+        stats = self.templates.get(name)
+        if stats is None:
+            stats = self.templates[name] = [0, 0.0, 0.0]
+
+        stats[0] += 1
+        stats[1] += total
+        stats[2] += self_time
+
+    def finish(self, span):
+        '''
+        Sets the summary tags on the request span, and logs the time
+        spent in every template.
+        '''
+        if not self.render_count:
+            return
+
+        span.set_tag('template.render_count', self.render_count)
+        span.set_tag('template.time_ms', round(self.render_time * 1000, 3))
+
+        summary = {'event': 'template.summary'}
+        for name, (count, total, self_time) in self.templates.items():
+            summary[name] = 'count=%d total_ms=%.3f self_ms=%.3f' % (
+                count, total * 1000, self_time * 1000
+            )
+        span.log_kv(summary)
+
+
+def _wrap(render):
+    @functools.wraps(render)
+    def wrapper(self, context):
+        collector = _current.get()
+        if collector is None or not collector.active:
+            return render(self, context)
+
+        return collector.render(render, self, context)
+
+    wrapper._opentracing_traced = True
+    return wrapper
+
+
+def install_template_tracing():
+    '''
+    Instruments the rendering of Django templates. Template.render() is
+    patched once; renders outside of a traced request are passed through.
+    '''
+    if not getattr(Template.render, '_opentracing_traced', False):
+        Template.render = _wrap(Template.render)
+
+
+def start_template_collection(tracing, request, max_spans):
+    '''
+    Starts timing the templates rendered for the current request.
+    Returns the collector, and a token to pass to
+    stop_template_collection().
+    '''
+    collector = TemplateCollector(tracing, request, max_spans)
+    return collector, _current.set(collector)
+
+
+def stop_template_collection(token):
+    _current.reset(token)
@@ -1,7 +1,24 @@
+import functools
+import time
+import weakref
+
 import opentracing
 from opentracing.ext import tags
 import six
 
+from .attributes import compile_attributes, to_tag_value
+from .naming import OperationNameResolver
+from .responses import ResponseStream, get_start_time, take_start_time
+from .routes import RouteRegistry, _route_view
+from .scopes import ScopeRegistry
+from .tail_sampling import BufferedSpan
+
+if six.PY3:
+    from ._async import iscoroutinefunction, trace_coroutine
+else:
+    def iscoroutinefunction(func):
+        return False
+
 
 class DjangoTracing(object):
     '''
@@ -14,8 +31,74 @@ class DjangoTracing(object):
 
         self._tracer_implementation = tracer
         self._start_span_cb = start_span_cb
-        self._current_scopes = {}
+        self._current_scopes = ScopeRegistry()
+        self._enabled = True
         self._trace_all = False
+        self._sampler = None
+        self._tail_sampler = None
+        self._metrics = None
+        self._max_tag_length = 1024
+        self._trace_breakdown = False
+        self._trace_streaming = True
+        self._get_operation_name = OperationNameResolver()
+        self._routes = RouteRegistry()
+        self._finisher = None
+        self._header_keys = None
+        self._header_prefixes = ()
+
+    @property
+    def enabled(self):
+        '''
+        Whether requests are traced. Can be set at runtime to turn tracing
+        off (e.g. during an incident) and back on; views decorated with
+        trace() and the middleware then only call through.
+        '''
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+
+    @property
+    def live_scopes(self):
+        '''
+        The number of requests currently being traced, as a gauge to spot
+        spans that are never finished.
+        '''
+        return len(self._current_scopes)
+
+    @property
+    def reaped_scopes(self):
+        '''
+        The number of request spans force-finished as their request never
+        reached the end of the middleware chain.
+        '''
+        return self._current_scopes.reaped
+
+    @property
+    def metrics(self):
+        '''
+        The RequestMetrics aggregating the requests, sampled or not, or
+        None.
+        '''
+        return self._metrics
+
+    @property
+    def dropped_spans(self):
+        '''
+        The number of request spans dropped as the queue of spans to
+        finish in the background was full.
+        '''
+        return 0 if self._finisher is None else self._finisher.dropped
+
+    def _set_finisher(self, finisher):
+        '''
+        @param finisher the SpanFinisher finishing request spans in the
+        background, or None to finish them inline
+        '''
+        if self._finisher is not None and self._finisher is not finisher:
+            self._finisher.close()
+        self._finisher = finisher
 
     def _get_tracer_impl(self):
         return self._tracer_implementation
@@ -23,15 +106,72 @@ class DjangoTracing(object):
     @property
     def tracer(self):
         if self._tracer_implementation:
-            return self._tracer_implementation
+            tracer = self._tracer_implementation
         else:
-            return opentracing.tracer
+            tracer = opentracing.tracer
+
+        if self._tail_sampler is not None:
+            # buffers the children of the request spans.
+            return self._tail_sampler.get_tracer(tracer)
+        return tracer
 
     @property
     def _tracer(self):
         '''DEPRECATED'''
         return self.tracer
 
+    def _set_propagation_headers(self, headers):
+        '''
+        @param headers names of the HTTP headers the tracer uses for
+        propagation, with a trailing '*' marking a prefix (e.g. baggage).
+        None restores extraction of every request header.
+        '''
+        if headers is None:
+            self._header_keys = None
+            self._header_prefixes = ()
+            return
+
+        keys = []
+        prefixes = []
+        for header in headers:
+            header = header.lower()
+            meta_key = 'HTTP_' + header.upper().replace('-', '_')
+            if header.endswith('*'):
+                prefixes.append(meta_key[:-1])
+            else:
+                keys.append((meta_key, header))
+
+        self._header_keys = tuple(keys)
+        self._header_prefixes = tuple(prefixes)
+
+    def _get_headers(self, request):
+        '''
+        Returns the request headers handed to the tracer for extraction.
+        '''
+        meta = request.META
+        headers = {}
+
+        if self._header_keys is None:
+            # strip headers for trace info
+            for k, v in six.iteritems(meta):
+                k = k.lower().replace('_', '-')
+                if k.startswith('http-'):
+                    k = k[5:]
+                headers[k] = v
+            return headers
+
+        for meta_key, header in self._header_keys:
+            value = meta.get(meta_key)
+            if value is not None:
+                headers[header] = value
+
+        if self._header_prefixes:
+            for k, v in six.iteritems(meta):
+                if k.startswith(self._header_prefixes):
+                    headers[k[5:].lower().replace('_', '-')] = v
+
+        return headers
+
     def get_span(self, request):
         '''
         @param request
@@ -40,12 +180,30 @@ class DjangoTracing(object):
         scope = self._current_scopes.get(request, None)
         return None if scope is None else scope.span
 
+    def defer_tags(self, span, func, *args):
+        '''
+        Sets tags on a span by calling func(span, *args) once the span is
+        known to be reported: right away, unless the span is buffered by
+        the tail sampler, in which case only if its trace is kept. For
+        tags that are costly to compute, e.g. from start_span_cb.
+        '''
+        if isinstance(span, BufferedSpan):
+            span.defer(func, *args)
+        else:
+            func(span, *args)
+
     def trace(self, *attributes):
         '''
         Function decorator that traces functions such as Views
         @param attributes any number of HttpRequest attributes
-        (strings) to be set as tags on the created span
+        (strings) to be set as tags on the created span, or dotted paths
+        into them, such as 'META.HTTP_USER_AGENT'
+
+        Class-based views can be decorated too, so that the views
+        returned by their as_view() are traced.
         '''
+        extractors = compile_attributes(attributes)
+
         def decorator(view_func):
             # TODO: do we want to provide option of overriding
             # trace_all_requests so that they can trace certain attributes
@@ -53,14 +211,34 @@ class DjangoTracing(object):
             # reinstate the name-mangling with a trace identifier, and another
             # settings key)
 
+            if isinstance(view_func, type):
+                return _trace_view_class(view_func, decorator)
+
+            # method_decorator() decorates a new partial of the method for
+            # every request; name and sample them after the method.
+            traced_view = view_func
+            if isinstance(view_func, functools.partial):
+                method = view_func.func
+                traced_view = getattr(method, '__func__', method)
+
+            if iscoroutinefunction(view_func):
+                return trace_coroutine(self, view_func, extractors,
+                                       traced_view)
+
+            @six.wraps(view_func)
             def wrapper(request, *args, **kwargs):
-                # if tracing all already, return right away.
-                if self._trace_all:
-                    return view_func(request)
+                # if tracing all already, or disabled, return right away.
+                if self._trace_all or not self._enabled:
+                    return view_func(request, *args, **kwargs)
+
+                route = self._get_route(request, route_view)
+                if route is not None and route.trace is False:
+                    return view_func(request, *args, **kwargs)
 
                 # otherwise, apply tracing.
                 try:
-                    self._apply_tracing(request, view_func, list(attributes))
+                    self._apply_tracing(request, traced_view, extractors,
+                                        route)
                     r = view_func(request, *args, **kwargs)
                 except Exception as exc:
                     self._finish_tracing(request, error=exc)
@@ -69,60 +247,164 @@ class DjangoTracing(object):
                 self._finish_tracing(request, r)
                 return r
 
+            route_view = _route_view(view_func, traced_view, wrapper)
             return wrapper
         return decorator
 
-    def _apply_tracing(self, request, view_func, attributes):
+    def _get_route(self, request, view_func):
+        '''
+        Returns the RouteOptions of the view, or None, after applying them
+        to the collectors the middleware started for the request.
+        '''
+        route = self._routes.get(request, view_func)
+        if route is not None:
+            route.configure_collectors(
+                getattr(request, '_opentracing_collectors', ())
+            )
+        return route
+
+    def _apply_tracing(self, request, view_func, extractors, route=None):
         '''
         Helper function to avoid rewriting for middleware and decorator.
-        Returns a new span from the request with logged attributes and
-        correct operation name from the view_func.
+        Returns a new scope from the request with logged attributes and
+        correct operation name from the view_func, or None if the request
+        was not sampled.
+        @param extractors the AttributeExtractors of the traced attributes
+        @param route the RouteOptions of the view, if any, overriding the
+        sampler, traced attributes, start span callback and the duration
+        above which the tail sampler keeps the request
         '''
-        # strip headers for trace info
-        headers = {}
-        for k, v in six.iteritems(request.META):
-            k = k.lower().replace('_', '-')
-            if k.startswith('http-'):
-                k = k[5:]
-            headers[k] = v
+        sampler = self._sampler
+        start_span_cb = self._start_span_cb
+        if route is not None:
+            if route.sampler is not None:
+                sampler = route.sampler
+            if route.traced_attributes is not None:
+                extractors = route.traced_attributes
+            if route.start_span_cb is not None:
+                start_span_cb = route.start_span_cb
+
+        if self._trace_breakdown:
+            # before META is traced.
+            take_start_time(request)
+
+        operation_name = None
+        start_time = None
+        if self._metrics is not None:
+            # requests are counted whether they are sampled or not; the
+            # start time is also given to the tracer, which would read
+            # the clock again.
+            operation_name = self._get_operation_name(request, view_func)
+            start_time = time.time()
+            request._opentracing_metrics = (operation_name, start_time)
+
+        # decide whether to trace this request at all before doing
+        # any span work.
+        span_ctx = None
+        extracted = False
+        if sampler is not None:
+            if sampler.uses_parent_context:
+                span_ctx = self._extract_context(request)
+                extracted = True
+            if not sampler.is_sampled(request, view_func, span_ctx):
+                return None
 
         # start new span from trace info
-        operation_name = view_func.__name__
-        try:
-            span_ctx = self.tracer.extract(opentracing.Format.HTTP_HEADERS,
-                                           headers)
-            scope = self.tracer.start_active_span(operation_name,
-                                                  child_of=span_ctx)
-        except (opentracing.InvalidCarrierException,
-                opentracing.SpanContextCorruptedException):
-            scope = self.tracer.start_active_span(operation_name)
+        if operation_name is None:
+            operation_name = self._get_operation_name(request, view_func)
+        if not extracted:
+            span_ctx = self._extract_context(request)
+
+        # spans are finished by _finish_span() rather than when their
+        # scope is closed, as they may outlive it.
+        if self._tail_sampler is not None:
+            scope = self._tail_sampler.start_active_span(
+                self.tracer,
+                operation_name,
+                child_of=span_ctx,
+                start_time=start_time,
+                slow_ms=route.slow_ms if route is not None else None,
+            )
+        else:
+            scope = self.tracer.start_active_span(
+                operation_name,
+                child_of=span_ctx,
+                start_time=start_time,
+                finish_on_close=False,
+            )
 
         # add span to current spans
         self._current_scopes[request] = scope
 
+        if isinstance(scope.span, BufferedSpan):
+            # only tag the request spans whose trace is kept; the request
+            # is weakly referenced so that the buffer does not keep it
+            # alive.
+            scope.span.defer(self._set_deferred_tags, weakref.ref(request),
+                             extractors)
+        else:
+            self._set_request_tags(scope.span, request, extractors)
+
+        # invoke the start span callback, if any
+        self._call_start_span_cb(scope.span, request, start_span_cb)
+
+        return scope
+
+    def _set_request_tags(self, span, request, extractors):
         # standard tags
-        scope.span.set_tag(tags.COMPONENT, 'django')
-        scope.span.set_tag(tags.SPAN_KIND, tags.SPAN_KIND_RPC_SERVER)
-        scope.span.set_tag(tags.HTTP_METHOD, request.method)
-        scope.span.set_tag(tags.HTTP_URL, request.get_full_path())
+        span.set_tag(tags.COMPONENT, 'django')
+        span.set_tag(tags.SPAN_KIND, tags.SPAN_KIND_RPC_SERVER)
+        span.set_tag(tags.HTTP_METHOD, request.method)
+        span.set_tag(tags.HTTP_URL, request.get_full_path())
 
         # log any traced attributes
-        for attr in attributes:
-            if hasattr(request, attr):
-                payload = str(getattr(request, attr))
-                if payload:
-                    scope.span.set_tag(attr, payload)
+        for extractor in extractors:
+            value = extractor(request)
+            if value is not None:
+                value = to_tag_value(value, self._max_tag_length)
+                if value is not None:
+                    span.set_tag(extractor.tag, value)
 
-        # invoke the start span callback, if any
-        self._call_start_span_cb(scope.span, request)
+    def _set_deferred_tags(self, span, request_ref, extractors):
+        request = request_ref()
+        if request is None:
+            # the span was reaped after its request was collected.
+            span.set_tag(tags.COMPONENT, 'django')
+            span.set_tag(tags.SPAN_KIND, tags.SPAN_KIND_RPC_SERVER)
+            return
 
-        return scope
+        self._set_request_tags(span, request, extractors)
+
+    def _extract_context(self, request):
+        try:
+            return self.tracer.extract(opentracing.Format.HTTP_HEADERS,
+                                       self._get_headers(request))
+        except (opentracing.InvalidCarrierException,
+                opentracing.SpanContextCorruptedException):
+            return None
+
+    def _add_collector(self, request, collector):
+        '''
+        Registers an object gathering data while the request is handled;
+        its finish() method is called with the request span right before
+        the span is finished.
+        '''
+        try:
+            request._opentracing_collectors.append(collector)
+        except AttributeError:
+            request._opentracing_collectors = [collector]
 
     def _finish_tracing(self, request, response=None, error=None):
         scope = self._current_scopes.pop(request, None)
         if scope is None:
+            if self._metrics is not None:
+                # the request was not sampled.
+                self._record_metrics(request, response, error, time.time())
             return
 
+        for collector in getattr(request, '_opentracing_collectors', ()):
+            collector.finish(scope.span)
+
         if error is not None:
             scope.span.set_tag(tags.ERROR, True)
             scope.span.log_kv({
@@ -132,18 +414,94 @@ class DjangoTracing(object):
         if response is not None:
             scope.span.set_tag(tags.HTTP_STATUS_CODE, response.status_code)
 
+        finish_time = time.time()
         scope.close()
 
-    def _call_start_span_cb(self, span, request):
-        if self._start_span_cb is None:
+        if response is not None:
+            if response.streaming and self._trace_streaming:
+                # finish the span once the body has been sent.
+                ResponseStream(response, lambda stream: self._finish_stream(
+                    scope.span, request, response, stream
+                ))
+                return
+
+            if self._trace_breakdown and not response.streaming:
+                scope.span.set_tag('http.response_content_length',
+                                   len(response.content))
+
+        if self._metrics is not None:
+            self._record_metrics(request, response, error, finish_time)
+        self._finish_span(scope.span, finish_time)
+
+    def _record_metrics(self, request, response, error, finish_time):
+        started = getattr(request, '_opentracing_metrics', None)
+        if started is None:
             return
+        # process_exception() and process_response() both finish it.
+        del request._opentracing_metrics
+
+        failed = error is not None or \
+            (response is not None and response.status_code >= 500)
+        self._metrics.record(started[0], started[1], finish_time, failed)
+
+    def _finish_stream(self, span, request, response, stream):
+        span.set_tag('http.response_content_length', stream.get_length())
+        span.set_tag('http.streaming_ms', round(
+            (stream.finish_time - stream.start_time) * 1000, 3
+        ))
+        if stream.aborted:
+            span.set_tag('http.streaming_aborted', True)
+
+        start_time = get_start_time(request)
+        if self._trace_breakdown and start_time is not None:
+            if stream.first_byte_time is not None:
+                span.set_tag('http.ttfb_ms', round(
+                    (stream.first_byte_time - start_time) * 1000, 3
+                ))
+            span.set_tag('http.total_ms', round(
+                (stream.finish_time - start_time) * 1000, 3
+            ))
+
+        if self._metrics is not None:
+            self._record_metrics(request, response, None, stream.finish_time)
+        self._finish_span(span, stream.finish_time)
+
+    def _finish_span(self, span, finish_time):
+        if self._finisher is None:
+            span.finish(finish_time=finish_time)
+        else:
+            self._finisher.submit(span, finish_time)
+
+    def _call_start_span_cb(self, span, request, start_span_cb=None):
+        if start_span_cb is None:
+            start_span_cb = self._start_span_cb
+            if start_span_cb is None:
+                return
 
         try:
-            self._start_span_cb(span, request)
+            start_span_cb(span, request)
         except Exception:
             pass
 
 
+def _trace_view_class(view_class, decorator):
+    '''
+    Makes as_view() return views decorated with decorator, so that
+    class-based views are wrapped once, when the URLs are loaded.
+    '''
+    as_view = view_class.as_view.__func__
+
+    @six.wraps(as_view)
+    def traced_as_view(cls, **initkwargs):
+        view = as_view(cls, **initkwargs)
+        # named after the class, which Django >= 4.0 no longer does.
+        view.__name__ = cls.__name__
+        return decorator(view)
+
+    view_class.as_view = classmethod(traced_as_view)
+    return view_class
+
+
 def initialize_global_tracer(tracing):
     '''
     Initialisation as per https://github.com/opentracing/opentracing-python/blob/9f9ef02d4ef7863fb26d3534a38ccdccf245494c/opentracing/__init__.py#L36 # noqa
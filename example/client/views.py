@@ -2,7 +2,6 @@ from django.conf import settings
 from django.http import HttpResponse
 from django.shortcuts import render
 
-import opentracing
 import six
 
 tracing = settings.OPENTRACING_TRACING
@@ -16,7 +15,6 @@ def client_index(request):
 def client_simple(request):
     url = "http://localhost:8000/server/simple"
     new_request = six.moves.urllib.request.Request(url)
-    inject_as_headers(tracing, tracing.tracer.active_span, new_request)
     try:
         response = six.moves.urllib.request.urlopen(new_request)
         return HttpResponse("Made a simple request")
@@ -27,7 +25,6 @@ def client_simple(request):
 def client_log(request):
     url = "http://localhost:8000/server/log"
     new_request = six.moves.urllib.request.Request(url)
-    inject_as_headers(tracing, tracing.tracer.active_span, new_request)
     try:
         response = six.moves.urllib.request.urlopen(new_request)
         return HttpResponse("Sent a request to log")
@@ -38,16 +35,8 @@ def client_log(request):
 def client_child_span(request):
     url = "http://localhost:8000/server/childspan"
     new_request = six.moves.urllib.request.Request(url)
-    inject_as_headers(tracing, tracing.tracer.active_span, new_request)
     try:
         response = six.moves.urllib.request.urlopen(new_request)
         return HttpResponse("Sent a request that should produce an additional child span")
     except six.moves.urllib.error.URLError as e:
         return HttpResponse("Error: " + str(e))
-
-def inject_as_headers(tracing, span, request):
-    text_carrier = {}
-    tracing.tracer.inject(span.context, opentracing.Format.TEXT_MAP, text_carrier)
-    for k, v in six.iteritems(text_carrier):
-        request.add_header(k,v)
-
@@ -43,14 +43,15 @@ INSTALLED_APPS = [
     'django_opentracing'
 ]
 
-MIDDLEWARE_CLASSES = [
+# the middleware also installs the tracing of outgoing requests
+# (OPENTRACING_TRACE_CLIENT below).
+MIDDLEWARE = [
     'django_opentracing.OpenTracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -125,4 +126,8 @@ OPENTRACING_TRACE_ALL = False
 # default is []
 OPENTRACING_TRACED_ATTRIBUTES = ['META']
 
+# default is False
+# outgoing HTTP requests get a client span and carry the trace context.
+OPENTRACING_TRACE_CLIENT = True
+
 
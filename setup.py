@@ -27,6 +27,12 @@ setup(
             'flake8-quotes',
             'mock',
         ],
+        'benchmarks': [
+            'pyperf',
+        ],
+        'celery': [
+            'celery',
+        ],
     },
     classifiers=[
         'Environment :: Web Environment',
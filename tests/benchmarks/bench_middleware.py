@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+'''
+Micro-benchmarks of the per-request cost of OpenTracingMiddleware and of
+the trace() decorator, using pyperf:
+
+    $ python bench_middleware.py --fast
+    $ python bench_middleware.py -o results.json
+    $ python -m pyperf compare_to before.json results.json
+
+Each benchmark runs process_view() and process_response() (or a traced
+view) for one request, so the reported times are per request. With
+--allocations, the benchmarks are not timed; instead the peak memory
+allocated while handling a request, and the number of memory blocks still
+allocated after it, are printed for each of them.
+'''
+import gc
+import os
+import sys
+import tracemalloc
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+settings.configure(
+    DEBUG=False,
+    SECRET_KEY='benchmarks',
+    ALLOWED_HOSTS=['*'],
+    ROOT_URLCONF=__name__,
+)
+django.setup()
+
+import opentracing  # noqa: E402
+from opentracing.mocktracer import MockTracer  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+import pyperf  # noqa: E402
+
+from django_opentracing import DjangoTracing  # noqa: E402
+from django_opentracing import OpenTracingMiddleware  # noqa: E402
+
+urlpatterns = []
+
+# the number of headers in the request, on top of the WSGI environ.
+META_SIZES = (5, 60)
+
+TRACED_ATTRIBUTES = ['META', 'path', 'method', 'FAKE_ATTRIBUTE']
+
+EXCLUDED_PATHS = ['/static/', '/health', '/metrics', '/media/*.png']
+
+
+class DiscardingMockTracer(MockTracer):
+    '''
+    MockTracer that does not keep finished spans, so that memory does not
+    grow with the number of loops.
+    '''
+    def _append_finished_span(self, span):
+        pass
+
+
+TRACERS = {
+    'noop': opentracing.Tracer,
+    'mock': DiscardingMockTracer,
+}
+
+
+def view(request):
+    return HttpResponse()
+
+
+def make_request(path='/api/items/', meta_size=5):
+    headers = dict(('HTTP_X_HEADER_%d' % i, 'value %d' % i)
+                   for i in range(meta_size))
+    headers['HTTP_USER_AGENT'] = 'benchmarks'
+    return RequestFactory().get(path, **headers)
+
+
+def make_tracing(tracer_name, **options):
+    '''
+    Returns a middleware created with the given settings, and its
+    DjangoTracing. Settings are set directly rather than overridden, so
+    that no setting_changed signal resets the configuration of the
+    middleware created before.
+    '''
+    tracing = DjangoTracing(TRACERS[tracer_name]())
+    options['OPENTRACING_TRACING'] = tracing
+    for name, value in options.items():
+        setattr(settings, name, value)
+    try:
+        middleware = OpenTracingMiddleware(view)
+    finally:
+        for name in options:
+            delattr(settings, name)
+        delattr(settings, 'OPENTRACING_TRACER')
+
+    return middleware, tracing
+
+
+def bench_middleware(loops, middleware, request, response):
+    process_view = middleware.process_view
+    process_response = middleware.process_response
+    range_it = range(loops)
+
+    t0 = pyperf.perf_counter()
+    for _ in range_it:
+        process_view(request, view, (), {})
+        process_response(request, response)
+    return pyperf.perf_counter() - t0
+
+
+def bench_decorator(loops, traced_view, request):
+    range_it = range(loops)
+
+    t0 = pyperf.perf_counter()
+    for _ in range_it:
+        traced_view(request)
+    return pyperf.perf_counter() - t0
+
+
+def get_benchmarks():
+    '''
+    Returns (name, function, args) for every benchmark.
+    '''
+    response = HttpResponse()
+    benchmarks = []
+
+    for tracer_name in sorted(TRACERS):
+        for meta_size in META_SIZES:
+            request = make_request(meta_size=meta_size)
+            suffix = '%s-meta%d' % (tracer_name, meta_size)
+
+            middleware, _ = make_tracing(tracer_name,
+                                         OPENTRACING_TRACE_ALL=False)
+            benchmarks.append(('middleware-disabled-' + suffix,
+                               bench_middleware,
+                               (middleware, request, response)))
+
+            middleware, _ = make_tracing(tracer_name)
+            benchmarks.append(('middleware-' + suffix, bench_middleware,
+                               (middleware, request, response)))
+
+            middleware, _ = make_tracing(
+                tracer_name,
+                OPENTRACING_PROPAGATION_HEADERS=['ot-tracer-traceid',
+                                                 'ot-tracer-spanid',
+                                                 'ot-baggage-*'],
+            )
+            benchmarks.append(('middleware-propagation-headers-' + suffix,
+                               bench_middleware,
+                               (middleware, request, response)))
+
+            middleware, _ = make_tracing(
+                tracer_name,
+                OPENTRACING_TRACED_ATTRIBUTES=TRACED_ATTRIBUTES,
+            )
+            benchmarks.append(('middleware-traced-attributes-' + suffix,
+                               bench_middleware,
+                               (middleware, request, response)))
+
+            middleware, _ = make_tracing(
+                tracer_name,
+                OPENTRACING_EXCLUDED_PATHS=EXCLUDED_PATHS,
+            )
+            benchmarks.append(('middleware-excluded-paths-' + suffix,
+                               bench_middleware,
+                               (middleware, request, response)))
+            benchmarks.append(('middleware-excluded-paths-hit-' + suffix,
+                               bench_middleware,
+                               (middleware,
+                                make_request('/health', meta_size),
+                                response)))
+
+            _, tracing = make_tracing(tracer_name,
+                                      OPENTRACING_TRACE_ALL=False)
+            benchmarks.append(('decorator-' + suffix, bench_decorator,
+                               (tracing.trace()(view), request)))
+
+            _, tracing = make_tracing(tracer_name)
+            benchmarks.append(('decorator-trace-all-' + suffix,
+                               bench_decorator,
+                               (tracing.trace()(view), request)))
+
+    return benchmarks
+
+
+def measure_allocations(benchmarks, loops=1000):
+    print('%-55s %12s %16s' % ('benchmark', 'peak (B)', 'retained blocks'))
+    for name, func, args in benchmarks:
+        # warm up caches (operation names, compiled patterns, ...).
+        func(10, *args)
+        gc.collect()
+
+        tracemalloc.start()
+        func(1, *args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        func(loops, *args)
+        gc.collect()
+        retained = float(sys.getallocatedblocks() - blocks) / loops
+
+        print('%-55s %12d %16.2f' % (name, peak, retained))
+
+
+def main():
+    runner = pyperf.Runner()
+    runner.argparser.add_argument(
+        '--allocations', action='store_true',
+        help='measure memory allocations instead of time',
+    )
+    runner.metadata['description'] = 'django_opentracing per-request cost'
+    args = runner.parse_args()
+
+    benchmarks = get_benchmarks()
+    if args.allocations:
+        measure_allocations(benchmarks)
+        return
+
+    for name, func, func_args in benchmarks:
+        runner.bench_time_func(name, func, *func_args)
+
+
+if __name__ == '__main__':
+    main()
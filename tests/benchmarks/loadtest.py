@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+'''
+End-to-end load test: serves the test site with every configuration of
+loadtest_settings.py in turn, drives it with concurrent clients
+(one connection per request, as keep-alive is not supported by every
+server), and prints the throughput, latency percentiles and memory of
+the server for each of them:
+
+    $ python loadtest.py
+    $ python loadtest.py --server gunicorn --workers 4 --duration 30
+    $ python loadtest.py --server uvicorn --configurations untraced sampled
+
+The default server is Django's threaded development server, which needs
+nothing besides Django; gunicorn and uvicorn are used when installed. The
+load is generated from this process, so on a single machine the numbers
+are best compared with each other rather than taken as absolute figures.
+'''
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from six.moves import http_client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TESTS_DIR = os.path.dirname(HERE)
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+
+CONFIGURATIONS = ('untraced', 'traced-all', 'decorator-only', 'sampled')
+
+# the view requested in every configuration; with the middleware only,
+# the view has to be decorated to be traced.
+PATHS = {
+    'untraced': '/untraced/',
+    'traced-all': '/untraced/',
+    'decorator-only': '/traced/',
+    'sampled': '/untraced/',
+}
+
+SERVERS = ('django', 'gunicorn', 'uvicorn')
+
+DJANGO_SERVER = '''
+import django
+from django.core.servers.basehttp import run
+from django.core.wsgi import get_wsgi_application
+
+django.setup()
+run('127.0.0.1', %(port)d, get_wsgi_application(), threading=True)
+'''
+
+
+def get_free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def get_server_command(server, port, workers):
+    if server == 'django':
+        return [sys.executable, '-c', DJANGO_SERVER % {'port': port}]
+    elif server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'loadtest_app:application',
+                '--bind', '127.0.0.1:%d' % port,
+                '--workers', str(workers), '--threads', '4',
+                '--log-level', 'warning']
+    return [sys.executable, '-m', 'uvicorn', 'loadtest_app:asgi_application',
+            '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--log-level', 'warning']
+
+
+def start_server(server, configuration, workers):
+    port = get_free_port()
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'loadtest_settings',
+        'DJANGO_OPENTRACING_LOADTEST': configuration,
+        'PYTHONPATH': os.pathsep.join([HERE, TESTS_DIR, ROOT_DIR]),
+    })
+    with open(os.devnull, 'w') as devnull:
+        process = subprocess.Popen(get_server_command(server, port, workers),
+                                   cwd=HERE, env=env,
+                                   stdout=devnull, stderr=devnull)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('%s exited with %d'
+                               % (server, process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.1).close()
+            return process, port
+        except socket.error:
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError('%s did not start listening' % (server,))
+
+
+def get_worker_pids(pid):
+    '''
+    Returns the pids of the server workers: the children of the server
+    process, or the server itself when it has none.
+    '''
+    path = '/proc/%d/task/%d/children' % (pid, pid)
+    try:
+        with open(path) as f:
+            children = [int(child) for child in f.read().split()]
+    except (IOError, OSError):
+        children = []
+
+    return children or [pid]
+
+
+def get_rss_kb(pid):
+    '''
+    Returns the resident memory of the process in kB, or None when it
+    cannot be read (only supported on Linux).
+    '''
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+
+    return None
+
+
+def client(port, path, deadline, latencies, errors):
+    # the connection is closed after every response, and reopened by
+    # the next request.
+    conn = http_client.HTTPConnection('127.0.0.1', port, timeout=10)
+    while True:
+        start = time.time()
+        if start >= deadline:
+            break
+
+        try:
+            conn.request('GET', path, headers={'Connection': 'close'})
+            response = conn.getresponse()
+            response.read()
+        except Exception as exc:
+            errors.append(exc)
+            continue
+        finally:
+            conn.close()
+
+        if response.status != 200:
+            errors.append(response.status)
+            continue
+
+        latencies.append(time.time() - start)
+
+
+def run_load(port, path, concurrency, duration):
+    '''
+    Sends requests from concurrency clients for duration seconds.
+    Returns the latencies of the successful requests, and the errors.
+    '''
+    deadline = time.time() + duration
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(target=client,
+                         args=(port, path, deadline, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return latencies, errors
+
+
+def percentile(values, p):
+    index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def measure(server, configuration, args):
+    process, port = start_server(server, configuration, args.workers)
+    path = PATHS[configuration]
+    try:
+        run_load(port, path, args.concurrency, args.warmup)
+        latencies, errors = run_load(port, path, args.concurrency,
+                                     args.duration)
+        rss = [get_rss_kb(pid) for pid in get_worker_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies.sort()
+    rss = [kb for kb in rss if kb is not None]
+    return {
+        'configuration': configuration,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / float(args.duration),
+        'p50': percentile(latencies, 50) * 1000 if latencies else 0,
+        'p99': percentile(latencies, 99) * 1000 if latencies else 0,
+        'rss': float(sum(rss)) / len(rss) / 1024 if rss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--server', choices=SERVERS, default='django')
+    parser.add_argument('--configurations', nargs='+',
+                        choices=CONFIGURATIONS, default=CONFIGURATIONS)
+    parser.add_argument('--workers', type=int, default=2,
+                        help='worker processes for gunicorn and uvicorn')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='number of concurrent clients')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds of load per configuration')
+    parser.add_argument('--warmup', type=float, default=2,
+                        help='seconds of load before measuring')
+    args = parser.parse_args()
+
+    print('%-16s %10s %8s %10s %10s %10s %14s' % (
+        'configuration', 'requests', 'errors', 'req/s', 'p50 (ms)',
+        'p99 (ms)', 'RSS/worker (MB)'))
+    for configuration in args.configurations:
+        result = measure(args.server, configuration, args)
+        rss = result['rss']
+        result['rss'] = 'n/a' if rss is None else '%.1f' % rss
+        print('%(configuration)-16s %(requests)10d %(errors)8d %(rps)10.1f '
+              '%(p50)10.2f %(p99)10.2f %(rss)14s' % result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+'''
+WSGI and ASGI entry points of the load test site, for gunicorn and uvicorn:
+
+    $ gunicorn loadtest_app:application
+    $ uvicorn loadtest_app:asgi_application
+'''
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loadtest_settings')
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+application = get_wsgi_application()
+
+try:
+    from django.core.asgi import get_asgi_application
+except ImportError:
+    # Django < 3.0
+    asgi_application = None
+else:
+    asgi_application = get_asgi_application()
@@ -0,0 +1,46 @@
+'''
+Settings of the test site as served by loadtest.py. The configuration to
+measure is given by the DJANGO_OPENTRACING_LOADTEST environment variable.
+'''
+import os
+
+from opentracing.mocktracer import MockTracer
+
+import django_opentracing
+from django_opentracing.sampling import ProbabilisticSampler
+from test_site.settings import *  # noqa: F401,F403
+from test_site.settings import MIDDLEWARE
+
+CONFIGURATIONS = ('untraced', 'traced-all', 'decorator-only', 'sampled')
+
+CONFIGURATION = os.environ.get('DJANGO_OPENTRACING_LOADTEST', 'traced-all')
+if CONFIGURATION not in CONFIGURATIONS:
+    raise ValueError('unknown configuration: %r' % (CONFIGURATION,))
+
+
+class DiscardingMockTracer(MockTracer):
+    '''
+    MockTracer that does not keep finished spans, so that the memory of
+    the server does not grow with the number of requests.
+    '''
+    def _append_finished_span(self, span):
+        pass
+
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+OPENTRACING_TRACING = django_opentracing.DjangoTracing(DiscardingMockTracer())
+OPENTRACING_TRACED_ATTRIBUTES = ['path', 'method']
+
+if CONFIGURATION == 'untraced':
+    MIDDLEWARE = [m for m in MIDDLEWARE
+                  if m != 'django_opentracing.OpenTracingMiddleware']
+    MIDDLEWARE_CLASSES = MIDDLEWARE
+elif CONFIGURATION == 'decorator-only':
+    OPENTRACING_TRACE_ALL = False
+else:
+    OPENTRACING_TRACE_ALL = True
+
+if CONFIGURATION == 'sampled':
+    OPENTRACING_SAMPLER = ProbabilisticSampler(0.1)
@@ -0,0 +1,151 @@
+'''
+The tests of the async middleware and views, imported by test_async on
+Python 3 only, as the syntax of coroutines does not parse on Python 2.
+'''
+import asyncio
+import unittest
+
+import django
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.conf import settings
+from opentracing.ext import tags
+from opentracing.mocktracer import MockTracer
+
+from django_opentracing import OpenTracingMiddleware
+
+from .test_cache import verify_cache_tags
+
+try:
+    from django.test import AsyncClient
+except ImportError:
+    AsyncClient = None
+
+
+def contextvars_settings():
+    # the middleware creates a tracer with the contextvars scope manager.
+    return override_settings(OPENTRACING_TRACER=None,
+                             OPENTRACING_TRACING=None,
+                             OPENTRACING_TRACER_CALLABLE=MockTracer,
+                             OPENTRACING_SCOPE_MANAGER='contextvars')
+
+
+@unittest.skipIf(django.VERSION < (3, 1), 'requires Django >= 3.1')
+class TestDjangoOpenTracingAsyncMiddleware(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def test_middleware_async_mode(self):
+        async def get_response(request):
+            return None
+
+        middleware = OpenTracingMiddleware(get_response)
+        assert asyncio.iscoroutinefunction(middleware)
+        assert asyncio.iscoroutinefunction(middleware.process_view)
+
+    def test_middleware_thread_local_warning(self):
+        async def get_response(request):
+            return None
+
+        with self.assertWarns(UserWarning):
+            OpenTracingMiddleware(get_response)
+
+    def test_middleware_sync_mode(self):
+        middleware = OpenTracingMiddleware(lambda request: None)
+        assert not asyncio.iscoroutinefunction(middleware)
+        assert not asyncio.iscoroutinefunction(middleware.process_view)
+
+    async def test_middleware_untraced(self):
+        response = await AsyncClient().get('/async_untraced/')
+        assert response['numspans'] == '1'
+        assert len(settings.OPENTRACING_TRACING._current_scopes) == 0
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 1
+
+    @override_settings(OPENTRACING_TRACE_ALL=False)
+    async def test_middleware_untraced_no_trace_all(self):
+        response = await AsyncClient().get('/async_untraced/')
+        assert response['numspans'] == '0'
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
+
+    async def test_middleware_sync_view(self):
+        await AsyncClient().get('/traced/')
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].tags.get(tags.HTTP_STATUS_CODE, None) == 200
+
+    @override_settings(OPENTRACING_TRACE_ALL=False)
+    async def test_middleware_traced_decorated(self):
+        response = await AsyncClient().get('/async_traced/')
+        assert response['numspans'] == '1'
+        assert len(settings.OPENTRACING_TRACING._current_scopes) == 0
+
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == 'async_traced_func'
+        assert spans[0].tags.get(tags.HTTP_STATUS_CODE, None) == 200
+
+    async def test_middleware_traced_with_arg(self):
+        response = await AsyncClient().get('/async_traced_with_arg/7/')
+        assert response['arg'] == '7'
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 1
+
+    @override_settings(OPENTRACING_TRACE_ALL=False)
+    async def test_middleware_traced_with_error_decorated(self):
+        with self.assertRaises(ValueError):
+            await AsyncClient().get('/async_traced_with_error/')
+
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].tags.get(tags.ERROR, False) is True
+
+    async def test_middleware_interleaved(self):
+        with contextvars_settings():
+            client = AsyncClient()
+            responses = await asyncio.gather(
+                client.get('/async_concurrent/?n=1'),
+                client.get('/async_concurrent/?n=2'),
+            )
+            tracer = settings.OPENTRACING_TRACING.tracer
+
+        for response in responses:
+            assert response['child_active'] == 'True'
+            assert response['request_active'] == 'True'
+
+        spans = tracer.finished_spans()
+        request_spans = dict(
+            (span.tags['http.url'].split('=')[1], span) for span in spans
+            if span.operation_name == 'async_concurrent_func'
+        )
+        child_spans = dict(
+            (span.tags['request'], span) for span in spans
+            if span.operation_name == 'child'
+        )
+        assert set(request_spans) == set(child_spans) == set(['1', '2'])
+        for n, request_span in request_spans.items():
+            assert request_span.parent_id is None
+            assert child_spans[n].parent_id == request_span.context.span_id
+
+    async def test_middleware_error_contextvars(self):
+        with contextvars_settings():
+            with self.assertRaises(ValueError):
+                await AsyncClient().get('/async_traced_with_error/')
+            tracer = settings.OPENTRACING_TRACING.tracer
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].tags.get(tags.ERROR, False) is True
+        assert tracer.active_span is None
+
+
+@unittest.skipIf(django.VERSION < (3, 1), 'requires Django >= 3.1')
+@override_settings(OPENTRACING_TRACE_CACHE=True)
+class TestDjangoOpenTracingAsyncCache(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+        cache.clear()
+
+    async def test_cache_tags(self):
+        await AsyncClient().get('/cache/')
+        verify_cache_tags()
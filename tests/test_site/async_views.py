@@ -0,0 +1,48 @@
+import asyncio
+
+from django.http import HttpResponse
+from django.conf import settings
+
+tracing = settings.OPENTRACING_TRACING
+
+
+async def async_untraced_func(request):
+    currentSpanCount = len(settings.OPENTRACING_TRACING._current_scopes)
+    response = HttpResponse()
+    response['numspans'] = currentSpanCount
+    return response
+
+
+@tracing.trace()
+async def async_traced_func(request):
+    currentSpanCount = len(settings.OPENTRACING_TRACING._current_scopes)
+    response = HttpResponse()
+    response['numspans'] = currentSpanCount
+    return response
+
+
+@tracing.trace()
+async def async_traced_func_with_arg(request, arg):
+    response = HttpResponse()
+    response['arg'] = arg
+    return response
+
+
+@tracing.trace()
+async def async_traced_func_with_error(request):
+    raise ValueError('key')
+
+
+async def async_concurrent_func(request):
+    tracing = settings.OPENTRACING_TRACING
+    tracer = tracing.tracer
+    request_span = tracing.get_span(request)
+    with tracer.start_active_span('child') as scope:
+        scope.span.set_tag('request', request.GET['n'])
+        # lets the other requests run while the span is active.
+        await asyncio.sleep(0.01)
+        child_active = tracer.active_span is scope.span
+    response = HttpResponse()
+    response['child_active'] = child_active
+    response['request_active'] = tracer.active_span is request_span
+    return response
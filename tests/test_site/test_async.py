@@ -0,0 +1,16 @@
+import unittest
+
+from django.test import SimpleTestCase
+import six
+
+if six.PY3:
+    from .async_tests import TestDjangoOpenTracingAsyncMiddleware  # noqa
+    from .async_tests import TestDjangoOpenTracingAsyncCache  # noqa
+else:
+    @unittest.skip('requires Python 3')
+    class TestDjangoOpenTracingAsyncMiddleware(SimpleTestCase):
+        pass
+
+    @unittest.skip('requires Python 3')
+    class TestDjangoOpenTracingAsyncCache(SimpleTestCase):
+        pass
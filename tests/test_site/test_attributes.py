@@ -0,0 +1,131 @@
+from django.test import SimpleTestCase, Client, RequestFactory, \
+    override_settings
+from django.conf import settings
+import mock
+
+from django_opentracing.attributes import AttributeExtractor, Mapping, \
+    compile_attributes, to_tag_value
+
+
+class TestAttributeExtractor(SimpleTestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get('/traced/',
+                                            HTTP_USER_AGENT='agent',
+                                            HTTP_X_REQUEST_ID='42')
+
+    def test_attribute(self):
+        extractor = AttributeExtractor('path')
+        assert extractor.tag == 'path'
+        assert extractor(self.request) == '/traced/'
+
+    def test_dotted_path(self):
+        extractor = AttributeExtractor('META.HTTP_USER_AGENT')
+        assert extractor.tag == 'META.HTTP_USER_AGENT'
+        assert extractor(self.request) == 'agent'
+
+        extractor = AttributeExtractor('request_id', 'headers.X-Request-Id')
+        assert extractor.tag == 'request_id'
+        assert extractor(self.request) == '42'
+
+    def test_callable(self):
+        extractor = AttributeExtractor('method', lambda r: r.method.lower())
+        assert extractor(self.request) == 'get'
+
+    def test_callable_error(self):
+        def user_pk(request):
+            raise RuntimeError()
+
+        assert AttributeExtractor('user', user_pk)(object()) is None
+
+    def test_missing(self):
+        assert AttributeExtractor('FAKE_ATTRIBUTE')(self.request) is None
+        assert AttributeExtractor('META.HTTP_FAKE')(self.request) is None
+        assert AttributeExtractor('path.fake')(self.request) is None
+
+    def test_compile_attributes(self):
+        extractors = compile_attributes(['path', 'META.HTTP_USER_AGENT'])
+        assert [e.tag for e in extractors] == ['path',
+                                               'META.HTTP_USER_AGENT']
+
+        extractors = compile_attributes({'http.user_agent':
+                                         'META.HTTP_USER_AGENT'})
+        assert [e.tag for e in extractors] == ['http.user_agent']
+        assert extractors[0](self.request) == 'agent'
+
+
+class TestToTagValue(SimpleTestCase):
+
+    def test_types_preserved(self):
+        assert to_tag_value(3) == 3
+        assert to_tag_value(1.5) == 1.5
+        assert to_tag_value(False) is False
+        assert to_tag_value('value') == 'value'
+
+    def test_converted(self):
+        assert to_tag_value(b'bytes') == 'bytes'
+        assert to_tag_value(['a']) == "['a']"
+        assert to_tag_value('') is None
+
+    def test_truncated(self):
+        assert to_tag_value('x' * 20, 10) == 'x' * 10 + '...'
+        assert to_tag_value('x' * 10, 10) == 'x' * 10
+        assert to_tag_value(10 ** 20, 10) == 10 ** 20
+
+    def test_mapping(self):
+        value = to_tag_value({'a': 'b', 'input': object(), 'n': 1})
+        assert eval(value) == {'a': 'b', 'n': 1}
+
+    def test_mapping_truncated(self):
+        seen = []
+
+        def items():
+            yield 'a', 'x' * 100
+            for i in range(100):
+                seen.append(i)
+                yield str(i), 'y'
+
+        mapping = mock.Mock(spec=Mapping, items=items)
+        assert to_tag_value(mapping, 10) == "{'a': 'xxx..."
+        # the entries past max_length were not formatted.
+        assert seen == []
+
+
+class TestDjangoOpenTracingTracedAttributes(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_span(self, path='/untraced/', **extra):
+        Client().get(path, **extra)
+        spans = settings.OPENTRACING_TRACING._tracer.finished_spans()
+        assert len(spans) == 1
+        return spans[0]
+
+    def test_meta_truncated(self):
+        span = self.get_span(HTTP_USER_AGENT='x' * 2000)
+        assert len(span.tags['META']) == 1024 + 3
+        assert 'wsgi.input' not in span.tags['META']
+        assert 'FAKE_ATTRIBUTE' not in span.tags
+
+    @override_settings(OPENTRACING_MAX_TAG_LENGTH=None)
+    def test_max_tag_length_disabled(self):
+        span = self.get_span(HTTP_USER_AGENT='x' * 2000)
+        assert 'x' * 2000 in span.tags['META']
+
+    @override_settings(OPENTRACING_TRACED_ATTRIBUTES={
+        'http.user_agent': 'META.HTTP_USER_AGENT',
+        'is_secure': lambda request: request.is_secure(),
+    })
+    def test_dict(self):
+        span = self.get_span(HTTP_USER_AGENT='agent')
+        assert span.tags['http.user_agent'] == 'agent'
+        assert span.tags['is_secure'] is False
+        assert 'META' not in span.tags
+
+    def test_decorator(self):
+        with override_settings(OPENTRACING_TRACE_ALL=False):
+            span = self.get_span('/traced_with_attrs/')
+        assert span.tags['path'] == '/traced_with_attrs/'
+        assert span.tags['scheme'] == 'http'
+        assert 'fake_setting' not in span.tags
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+
+from django_opentracing.cache import CacheCollector
+
+
+class TestCacheCollector(SimpleTestCase):
+
+    def test_histogram(self):
+        collector = CacheCollector()
+        collector.record('get', 0.00005, hits=1)
+        collector.record('get', 0.002, misses=1)
+        collector.record('get', 1.0, error=True)
+
+        stats = collector.operations['get']
+        assert stats['count'] == 3
+        assert stats['buckets'] == [1, 0, 0, 1, 0, 0, 0, 1]
+        assert collector.hits == 1
+        assert collector.misses == 1
+        assert collector.errors == 1
+
+
+def verify_cache_tags():
+    spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.tags['cache.calls'] == 5
+    assert span.tags['cache.hits'] == 2
+    assert span.tags['cache.misses'] == 2
+    assert span.tags['cache.hit_ratio'] == 0.5
+
+    summary = span.logs[0].key_values
+    assert summary['event'] == 'cache.summary'
+    assert summary['cache.get.count'] == 2
+    assert summary['cache.get_many.count'] == 1
+    assert summary['cache.set.count'] == 1
+    assert summary['cache.delete.count'] == 1
+
+
+@override_settings(OPENTRACING_TRACE_CACHE=True)
+class TestDjangoOpenTracingCache(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+        cache.clear()
+
+    def test_cache_tags(self):
+        Client().get('/cache/')
+        verify_cache_tags()
+
+    def test_outside_request(self):
+        Client().get('/untraced/')
+        cache.get('a')
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        assert 'cache.calls' not in spans[0].tags
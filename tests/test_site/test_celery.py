@@ -0,0 +1,124 @@
+import unittest
+
+from django.test import SimpleTestCase
+from django.conf import settings
+import mock
+from opentracing.ext import tags
+
+try:
+    import celery
+except ImportError:
+    celery = None
+else:
+    from celery import signals
+    from celery.contrib.testing.worker import start_worker
+    from django_opentracing import celery as celery_tracing
+    from django_opentracing.celery import install_celery_tracing
+    from django_opentracing.celery import uninstall_celery_tracing
+
+    app = celery.Celery('test_site', broker='memory://',
+                        backend='cache+memory://')
+    app.conf.task_always_eager = False
+
+    @app.task
+    def add(x, y):
+        return x + y
+
+    @app.task
+    def fail():
+        raise ValueError('task failed')
+
+
+@unittest.skipIf(celery is None, 'celery is not installed')
+class TestDjangoOpenTracingCelery(SimpleTestCase):
+
+    def setUp(self):
+        self.tracer = settings.OPENTRACING_TRACING.tracer
+        self.tracer.reset()
+        install_celery_tracing()
+        app.conf.task_always_eager = True
+
+    def tearDown(self):
+        uninstall_celery_tracing()
+        app.conf.task_always_eager = False
+
+    def get_spans(self):
+        return dict((span.operation_name, span)
+                    for span in self.tracer.finished_spans())
+
+    def test_eager(self):
+        with self.tracer.start_active_span('request'):
+            assert add.delay(1, 2).get() == 3
+
+        spans = self.get_spans()
+        task_span = spans['test_site.test_celery.add']
+        assert task_span.parent_id == spans['request'].context.span_id
+        assert task_span.tags[tags.SPAN_KIND] == tags.SPAN_KIND_CONSUMER
+        assert task_span.tags['celery.state'] == 'SUCCESS'
+
+    def test_eager_no_parent(self):
+        add.delay(1, 2)
+
+        spans = self.get_spans()
+        assert spans['test_site.test_celery.add'].parent_id is None
+
+    def test_failure(self):
+        fail.apply()
+
+        span = self.get_spans()['test_site.test_celery.fail']
+        assert span.tags[tags.ERROR] is True
+        assert span.tags['celery.state'] == 'FAILURE'
+        assert isinstance(span.logs[0].key_values['error.object'],
+                          ValueError)
+
+    def start_task(self, task_id):
+        signals.task_prerun.send(sender=add, task_id=task_id, task=add,
+                                 args=(), kwargs={})
+        return celery_tracing._scopes.get(task_id)
+
+    def test_revoked(self):
+        scope = self.start_task('1')
+        signals.task_revoked.send(sender=add, request=mock.Mock(id='1'),
+                                  terminated=True, signum=15, expired=False)
+        assert celery_tracing._scopes == {}
+
+        span = self.get_spans()['test_site.test_celery.add']
+        assert span.tags['celery.state'] == 'REVOKED'
+        scope.close()
+
+    @mock.patch('django_opentracing.celery.MAX_SCOPES', 1)
+    def test_max_scopes(self):
+        first = self.start_task('1')
+        second = self.start_task('2')
+        assert list(celery_tracing._scopes) == ['2']
+        assert first.span.finish_time is not None
+        assert first.span.logs[0].key_values['event'] == 'reaped'
+
+        signals.task_postrun.send(sender=add, task_id='2', task=add,
+                                  state='SUCCESS')
+        assert second.span.finish_time is not None
+        first.close()
+
+    def test_broker(self):
+        app.conf.task_always_eager = False
+        with start_worker(app, pool='solo', perform_ping_check=False):
+            with self.tracer.start_active_span('request'):
+                result = add.delay(1, 2)
+            assert result.get(timeout=10) == 3
+
+        spans = self.tracer.finished_spans()
+        request_span, = [span for span in spans
+                         if span.operation_name == 'request']
+        producer_span, = [span for span in spans
+                          if span.tags.get(tags.SPAN_KIND) ==
+                          tags.SPAN_KIND_PRODUCER]
+        consumer_span, = [span for span in spans
+                          if span.tags.get(tags.SPAN_KIND) ==
+                          tags.SPAN_KIND_CONSUMER]
+
+        assert producer_span.operation_name == 'test_site.test_celery.add'
+        assert producer_span.tags['celery.task_id'] == result.id
+        assert producer_span.parent_id == request_span.context.span_id
+        assert consumer_span.parent_id == producer_span.context.span_id
+        assert consumer_span.context.trace_id == \
+            request_span.context.trace_id
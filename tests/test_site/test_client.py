@@ -0,0 +1,102 @@
+import threading
+
+from django.test import SimpleTestCase
+from opentracing.ext import tags
+from opentracing.mocktracer import MockTracer
+from six.moves import BaseHTTPServer, http_client, urllib
+
+from django_opentracing import DjangoTracing
+from django_opentracing.client import (
+    install_client_tracing,
+    uninstall_client_tracing,
+)
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.headers.get('ot-tracer-spanid', '').encode('ascii')
+        self.send_response(200 if self.path != '/error' else 500)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestClientTracing(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestClientTracing, cls).setUpClass()
+        cls.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        cls.port = cls.server.server_address[1]
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super(TestClientTracing, cls).tearDownClass()
+
+    def setUp(self):
+        self.tracer = MockTracer()
+        install_client_tracing(DjangoTracing(self.tracer))
+
+    def tearDown(self):
+        uninstall_client_tracing()
+
+    def test_no_active_span(self):
+        url = 'http://127.0.0.1:%d/' % self.port
+        body = urllib.request.urlopen(url).read()
+        assert body == b''
+        assert len(self.tracer.finished_spans()) == 0
+
+    def test_urllib(self):
+        url = 'http://127.0.0.1:%d/path?q=1' % self.port
+        with self.tracer.start_active_span('parent'):
+            body = urllib.request.urlopen(url).read()
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 2
+        span, parent = spans
+        assert span.parent_id == parent.context.span_id
+        assert span.operation_name == 'GET'
+        assert span.tags[tags.SPAN_KIND] == tags.SPAN_KIND_RPC_CLIENT
+        assert span.tags[tags.HTTP_URL] == url
+        assert span.tags[tags.HTTP_STATUS_CODE] == 200
+        assert span.tags['http.connection_reused'] is False
+        assert 'http.connect_ms' in span.tags
+        assert 'http.ttfb_ms' in span.tags
+
+        # the context was injected in the request headers.
+        assert body == ('%x' % span.context.span_id).encode('ascii')
+
+    def test_reused_connection(self):
+        conn = http_client.HTTPConnection('127.0.0.1', self.port)
+        with self.tracer.start_active_span('parent'):
+            for path in ('/', '/error'):
+                conn.request('GET', path)
+                conn.getresponse().read()
+        conn.close()
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 3
+        assert spans[0].tags['http.connection_reused'] is False
+        assert spans[1].tags['http.connection_reused'] is True
+        assert 'http.connect_ms' not in spans[1].tags
+        assert spans[1].tags[tags.HTTP_STATUS_CODE] == 500
+
+    def test_connection_error(self):
+        conn = http_client.HTTPConnection('127.0.0.1', 1)
+        with self.tracer.start_active_span('parent'):
+            with self.assertRaises(Exception):
+                conn.request('GET', '/')
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 2
+        assert spans[0].tags[tags.ERROR] is True
@@ -0,0 +1,138 @@
+import threading
+import unittest
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client, SimpleTestCase, override_settings
+import mock
+from opentracing.mocktracer import MockTracer
+
+from django_opentracing import DjangoTracing
+from django_opentracing.scopes import get_scope_manager
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+WORKERS = 16
+REQUESTS = 20
+
+
+def scope_manager_settings(scope_manager):
+    # the middleware creates the tracer with the scope manager.
+    return override_settings(
+        OPENTRACING_TRACER=None,
+        OPENTRACING_TRACING=None,
+        OPENTRACING_TRACER_CALLABLE=MockTracer,
+        OPENTRACING_SCOPE_MANAGER=scope_manager,
+    )
+
+
+class TestConcurrency(SimpleTestCase):
+    '''
+    Hammers the middleware from many threads (or greenlets), checking
+    that every span has the right parent and that nothing leaks from a
+    request to another.
+    '''
+
+    def load_middleware(self, scope_manager):
+        Client().get('/untraced/')
+        self.tracing = settings.OPENTRACING_TRACING
+        self.tracer = self.tracing.tracer
+        assert type(self.tracer.scope_manager) is \
+            get_scope_manager(scope_manager)
+        self.tracer.reset()
+
+    def work(self, worker, results):
+        client = Client()
+        for i in range(REQUESTS):
+            n = '%d-%d' % (worker, i)
+            results[n] = client.get('/concurrent/', {'n': n})
+        results[worker] = self.tracer.active_span
+
+    def check(self, results):
+        assert self.tracing.live_scopes == 0
+        for worker in range(WORKERS):
+            assert results.pop(worker) is None
+        assert len(results) == WORKERS * REQUESTS
+        for response in results.values():
+            assert response['child_active'] == 'True'
+            assert response['request_active'] == 'True'
+
+        spans = self.tracer.finished_spans()
+        request_spans = dict(
+            (span.tags['http.url'].split('=')[1], span) for span in spans
+            if span.operation_name == 'concurrent_func'
+        )
+        child_spans = dict(
+            (span.tags['request'], span) for span in spans
+            if span.operation_name == 'child'
+        )
+        assert set(request_spans) == set(results)
+        assert set(child_spans) == set(results)
+
+        for n, request_span in request_spans.items():
+            child_span = child_spans[n]
+            assert request_span.parent_id is None
+            assert child_span.parent_id == request_span.context.span_id
+            assert child_span.context.trace_id == \
+                request_span.context.trace_id
+
+    def run_threads(self):
+        results = {}
+        threads = [threading.Thread(target=self.work, args=(worker, results))
+                   for worker in range(WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.check(results)
+
+    @scope_manager_settings('threadlocal')
+    def test_threadlocal(self):
+        self.load_middleware('threadlocal')
+        self.run_threads()
+
+    @scope_manager_settings('contextvars')
+    def test_contextvars(self):
+        self.load_middleware('contextvars')
+        self.run_threads()
+
+    @unittest.skipIf(gevent is None, 'gevent is not installed')
+    @scope_manager_settings('gevent')
+    def test_gevent(self):
+        self.load_middleware('gevent')
+
+        results = {}
+        with mock.patch('test_site.views.switch', gevent.sleep):
+            gevent.joinall([gevent.spawn(self.work, worker, results)
+                            for worker in range(WORKERS)])
+        self.check(results)
+
+    def test_scope_manager_instance(self):
+        scope_manager = get_scope_manager('contextvars')()
+        with scope_manager_settings(scope_manager):
+            Client().get('/untraced/')
+            tracer = settings.OPENTRACING_TRACING.tracer
+            assert tracer.scope_manager is scope_manager
+
+    def test_tracing_scope_manager(self):
+        scope_manager = get_scope_manager('contextvars')()
+        tracing = DjangoTracing(MockTracer(scope_manager=scope_manager))
+        with override_settings(OPENTRACING_TRACER=None,
+                               OPENTRACING_TRACING=tracing,
+                               OPENTRACING_SCOPE_MANAGER='contextvars'):
+            Client().get('/untraced/')
+            assert settings.OPENTRACING_TRACING is tracing
+
+        # the scope manager of a tracer is not replaced.
+        with override_settings(OPENTRACING_TRACER=None,
+                               OPENTRACING_TRACING=tracing,
+                               OPENTRACING_SCOPE_MANAGER='threadlocal'):
+            with self.assertRaises(ImproperlyConfigured):
+                Client().get('/untraced/')
+
+    def test_unknown_scope_manager(self):
+        with self.assertRaises(ValueError):
+            get_scope_manager('greenlet')
@@ -0,0 +1,100 @@
+import unittest
+import warnings
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+import mock
+from opentracing.ext import tags
+
+from django_opentracing import OpenTracingMiddleware
+from django_opentracing.db import normalize_sql
+
+
+class TestNormalizeSql(SimpleTestCase):
+
+    def test_literals(self):
+        assert normalize_sql(
+            "SELECT * FROM t1 WHERE a = 'x''y' AND b = -1.5"
+        ) == 'SELECT * FROM t1 WHERE a = ? AND b = ?'
+
+    def test_lists(self):
+        assert normalize_sql(
+            'SELECT *\n  FROM t WHERE id IN (%s, %s,%s)'
+        ) == 'SELECT * FROM t WHERE id IN (...)'
+
+
+@override_settings(OPENTRACING_TRACE_DB=True)
+class TestDjangoOpenTracingDatabaseSettings(SimpleTestCase):
+
+    def test_old_django(self):
+        with mock.patch('django.VERSION', (1, 11, 0, 'final', 0)):
+            with self.assertRaises(ImproperlyConfigured):
+                OpenTracingMiddleware(lambda request: None)
+
+    def test_middleware_classes(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            OpenTracingMiddleware(lambda request: None)
+            assert caught == []
+
+            # old-style middleware is never called.
+            OpenTracingMiddleware()
+            assert len(caught) == 1
+            assert 'MIDDLEWARE' in str(caught[0].message)
+
+
+@unittest.skipIf(django.VERSION < (2, 0), 'requires Django >= 2.0')
+@override_settings(OPENTRACING_TRACE_DB=True)
+class TestDjangoOpenTracingDatabase(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_spans(self):
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        request_span = spans[-1]
+        assert request_span.operation_name == 'db_func'
+        return request_span, spans[:-1]
+
+    def test_query_spans(self):
+        Client().get('/db/')
+
+        request_span, query_spans = self.get_spans()
+        assert len(query_spans) == 4
+        for span in query_spans:
+            assert span.operation_name == 'SELECT'
+            assert span.parent_id == request_span.context.span_id
+            assert span.tags[tags.DATABASE_INSTANCE] == 'default'
+            assert span.tags[tags.DATABASE_TYPE] == 'sqlite'
+        assert query_spans[3].tags[tags.DATABASE_STATEMENT] == \
+            'SELECT ? WHERE ? IN (...)'
+
+        assert request_span.tags['db.query_count'] == 4
+        assert request_span.tags['db.duplicate_query_count'] == 2
+        assert request_span.tags['db.most_duplicated_statement'] == \
+            'SELECT %s'
+        assert request_span.tags['db.most_duplicated_count'] == 3
+
+    @override_settings(OPENTRACING_DB_SLOW_QUERY_MS=1000)
+    def test_slow_query_threshold(self):
+        Client().get('/db/')
+
+        request_span, query_spans = self.get_spans()
+        assert len(query_spans) == 0
+        assert request_span.tags['db.query_count'] == 4
+
+    @override_settings(OPENTRACING_TRACE_DB_ALIASES=[])
+    def test_no_aliases(self):
+        Client().get('/db/')
+
+        request_span, query_spans = self.get_spans()
+        assert len(query_spans) == 0
+        assert 'db.query_count' not in request_span.tags
+
+    @override_settings(OPENTRACING_EXCLUDED_PATHS=['/db/'])
+    def test_untraced_request(self):
+        Client().get('/db/')
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
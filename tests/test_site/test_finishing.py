@@ -0,0 +1,123 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+import mock
+
+from django_opentracing.finishing import SpanFinisher
+
+
+class TestSpanFinisher(SimpleTestCase):
+
+    def test_finish(self):
+        finisher = SpanFinisher()
+        span = mock.Mock()
+        finisher.submit(span, 10.0)
+        assert finisher.flush(1)
+        span.finish.assert_called_once_with(finish_time=10.0)
+        assert finisher.finished == 1
+        finisher.close(1)
+
+    def test_background_thread(self):
+        finisher = SpanFinisher()
+        threads = []
+        span = mock.Mock()
+        span.finish.side_effect = \
+            lambda finish_time: threads.append(threading.current_thread())
+        finisher.submit(span, 10.0)
+        finisher.flush(1)
+        assert threads[0] is not threading.current_thread()
+        finisher.close(1)
+
+    def blocked_finisher(self, drop_policy):
+        finisher = SpanFinisher(max_queue_size=2, drop_policy=drop_policy)
+        # do not start the background thread.
+        finisher._wake = lambda: None
+        return finisher
+
+    def test_drop_newest(self):
+        finisher = self.blocked_finisher('drop_newest')
+        for i in range(3):
+            finisher.submit(i, 10.0)
+        assert finisher.dropped == 1
+        assert list(finisher._queue) == [(0, 10.0), (1, 10.0)]
+
+    def test_drop_oldest(self):
+        finisher = self.blocked_finisher('drop_oldest')
+        for i in range(3):
+            finisher.submit(i, 10.0)
+        assert finisher.dropped == 1
+        assert list(finisher._queue) == [(1, 10.0), (2, 10.0)]
+
+    def test_drop_oldest_keeps_markers(self):
+        finisher = self.blocked_finisher('drop_oldest')
+        done = threading.Event()
+        finisher._queue.append((None, done))
+        for i in range(3):
+            finisher.submit(i, 10.0)
+        assert finisher.dropped == 2
+        assert list(finisher._queue) == [(None, done), (2, 10.0)]
+
+    def test_single_thread(self):
+        finisher = SpanFinisher()
+        starts = []
+        start = finisher._start
+
+        def slow_start():
+            starts.append(None)
+            time.sleep(0.01)
+            start()
+
+        finisher._start = slow_start
+        threads = [threading.Thread(target=finisher.submit,
+                                    args=(mock.Mock(), 10.0))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(starts) == 1
+        assert finisher.flush(1)
+        assert finisher.finished == 8
+        finisher.close(1)
+
+    def test_finish_inline(self):
+        finisher = self.blocked_finisher('finish_inline')
+        spans = [mock.Mock() for _ in range(3)]
+        for span in spans:
+            finisher.submit(span, 10.0)
+        assert finisher.dropped == 0
+        spans[2].finish.assert_called_once_with(finish_time=10.0)
+        assert not spans[0].finish.called
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            SpanFinisher(drop_policy='unknown')
+
+
+@override_settings(OPENTRACING_ASYNC_FINISH=True)
+class TestDjangoOpenTracingAsyncFinish(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def test_middleware_traced(self):
+        client = Client()
+        response = client.get('/traced/')
+        assert response['numspans'] == '1'
+
+        tracing = settings.OPENTRACING_TRACING
+        assert tracing._finisher.flush(1)
+        spans = tracing.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].finish_time is not None
+        assert tracing.tracer.active_span is None
+        assert tracing.dropped_spans == 0
+
+    def test_finisher_reused(self):
+        Client().get('/traced/')
+        finisher = settings.OPENTRACING_TRACING._finisher
+        Client().get('/traced/')
+        assert settings.OPENTRACING_TRACING._finisher is finisher
@@ -0,0 +1,159 @@
+import threading
+
+from django.test import SimpleTestCase, Client, RequestFactory
+from django.test import override_settings
+from django.conf import settings
+
+from django_opentracing.metrics import Histogram, RequestMetrics
+from django_opentracing.sampling import ProbabilisticSampler
+from django_opentracing.metrics import metrics_view
+
+
+class TestHistogram(SimpleTestCase):
+
+    def test_percentile(self):
+        histogram = Histogram()
+        assert histogram.percentile(50) == 0
+
+        for value in range(1, 100001):
+            histogram.record(value)
+
+        assert histogram.count == 100000
+        assert histogram.max == 100000
+        for percentile in (1, 50, 90, 99, 99.9):
+            expected = percentile * 1000
+            assert abs(histogram.percentile(percentile) - expected) <= \
+                expected / 16.0
+        assert histogram.percentile(100) == 100000
+
+        # small values are recorded exactly.
+        histogram = Histogram()
+        for value in (0, 3, 7):
+            histogram.record(value)
+        assert histogram.percentile(50) == 3
+
+    def test_merge(self):
+        first, second = Histogram(), Histogram()
+        first.record(10)
+        second.record(10)
+        second.record(1000)
+        first.merge(second)
+        assert first.count == 3
+        assert first.total == 1020
+        assert first.max == 1000
+        assert first.percentile(50) == 10
+
+
+class TestRequestMetrics(SimpleTestCase):
+
+    def test_record(self):
+        metrics = RequestMetrics()
+        metrics.record('index', 10.0, 10.5)
+        metrics.record('index', 10.0, 10.25, error=True)
+        metrics.record('other', 10.0, 9.0)
+
+        snapshot = metrics.snapshot()
+        assert snapshot['index'].requests == 2
+        assert snapshot['index'].errors == 1
+        assert snapshot['index'].durations.max == 500000
+        # clock going back.
+        assert snapshot['other'].durations.max == 0
+
+    def test_threads(self):
+        metrics = RequestMetrics()
+
+        def record():
+            for i in range(100):
+                metrics.record('index', 0.0, 0.001)
+
+        threads = [threading.Thread(target=record) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.record('index', 0.0, 0.001)
+
+        assert metrics.snapshot()['index'].requests == 801
+        # the shards of the ended threads were folded into one.
+        assert len(metrics._shards) == 1
+        assert metrics.snapshot()['index'].requests == 801
+
+    def test_callback(self):
+        snapshots = []
+        metrics = RequestMetrics(callback=snapshots.append, interval=10)
+        metrics.record('index', 100.0, 100.0)
+        metrics.record('index', 100.0, 105.0)
+        assert snapshots == []
+
+        metrics.record('index', 100.0, 110.0)
+        assert len(snapshots) == 1
+        assert snapshots[0]['index'].requests == 3
+
+        metrics.record('index', 100.0, 115.0)
+        assert len(snapshots) == 1
+
+
+class TestDjangoOpenTracingMetrics(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def tearDown(self):
+        settings.OPENTRACING_TRACING._metrics = None
+
+    def test_requests(self):
+        metrics = RequestMetrics()
+        with override_settings(OPENTRACING_METRICS=metrics):
+            client = Client()
+            client.get('/untraced/')
+            client.get('/untraced/')
+            client.get('/status/500/')
+            client.get('/streaming/').getvalue()
+
+        snapshot = metrics.snapshot()
+        assert snapshot['untraced_func'].requests == 2
+        assert snapshot['untraced_func'].errors == 0
+        assert snapshot['status_func'].errors == 1
+        assert snapshot['streaming_func'].requests == 1
+
+        # the durations are the ones of the spans.
+        spans = settings.OPENTRACING_TRACING._tracer.finished_spans()
+        durations = snapshot['untraced_func'].durations
+        assert durations.total == sum(
+            int((span.finish_time - span.start_time) * 1000000)
+            for span in spans if span.operation_name == 'untraced_func'
+        )
+
+    def test_unsampled(self):
+        metrics = RequestMetrics()
+        with override_settings(OPENTRACING_METRICS=metrics,
+                               OPENTRACING_SAMPLER=ProbabilisticSampler(0)):
+            client = Client()
+            client.get('/untraced/')
+            client.get('/status/500/')
+
+        assert settings.OPENTRACING_TRACING._tracer.finished_spans() == []
+        snapshot = metrics.snapshot()
+        assert snapshot['untraced_func'].requests == 1
+        assert snapshot['untraced_func'].durations.count == 1
+        assert snapshot['status_func'].requests == 1
+        assert snapshot['status_func'].errors == 1
+
+    def test_view(self):
+        request = RequestFactory().get('/metrics')
+        assert metrics_view(request).status_code == 404
+
+        metrics = RequestMetrics()
+        metrics.record('index', 0.0, 0.25)
+        metrics.record('index', 0.0, 0.5, error=True)
+        settings.OPENTRACING_TRACING._metrics = metrics
+
+        response = metrics_view(request)
+        assert response.status_code == 200
+        body = response.content.decode()
+        assert 'django_requests_total{operation="index"} 2\n' in body
+        assert 'django_request_errors_total{operation="index"} 1\n' in body
+        assert 'django_request_duration_seconds_sum{operation="index"} ' \
+            '0.750000\n' in body
+        assert 'django_request_duration_seconds{operation="index",' \
+            'quantile="0.5"} 0.2' in body
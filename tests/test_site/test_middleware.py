@@ -1,5 +1,8 @@
-from django.test import SimpleTestCase, Client, override_settings
+from django.test import SimpleTestCase, Client, RequestFactory, \
+    override_settings
 from django.conf import settings
+from django.http import HttpResponse
+from django.views.generic import View
 import mock
 import opentracing
 from opentracing.ext import tags
@@ -86,6 +89,62 @@ class TestDjangoOpenTracingMiddleware(SimpleTestCase):
         assert response['arg'] == '7'
         assert len(settings.OPENTRACING_TRACING._current_scopes) == 0
 
+    def test_middleware_traced_with_arg(self):
+        client = Client()
+        response = client.get('/traced_with_arg/7/')
+        assert response['numspans'] == '1'
+        assert response['arg'] == '7'
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 1
+
+    def test_decorator_wraps(self):
+        from test_site import views
+
+        assert views.traced_func.__name__ == 'traced_func'
+        assert views.traced_func.__module__ == 'test_site.views'
+
+        Client().get('/traced/')
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert spans[0].operation_name == 'traced_func'
+
+    @override_settings(OPENTRACING_TRACE_ALL=False)
+    def test_middleware_traced_class_decorated(self):
+        client = Client()
+        response = client.get('/traced_class/7/')
+        assert response['arg'] == '7'
+
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == 'TracedView'
+
+    def test_traced_class_name(self):
+        class LaterView(View):
+            # as_view() of Django >= 4.0 returns a function named 'view'.
+            @classmethod
+            def as_view(cls, **initkwargs):
+                def view(request, *args, **kwargs):
+                    return HttpResponse()
+                view.view_class = cls
+                return view
+
+        tracing = settings.OPENTRACING_TRACING
+        view = tracing.trace()(LaterView).as_view()
+        request = RequestFactory().get('/')
+        assert tracing._get_operation_name(request, view) == 'LaterView'
+
+    @override_settings(OPENTRACING_TRACE_ALL=False)
+    def test_middleware_traced_method_decorated(self):
+        tracing = settings.OPENTRACING_TRACING
+        client = Client()
+        client.get('/method_traced_class/')
+        names = len(tracing._get_operation_name._names)
+        client.get('/method_traced_class/')
+        # requests are named after the method, not its partials.
+        assert len(tracing._get_operation_name._names) == names
+
+        spans = tracing.tracer.finished_spans()
+        assert len(spans) == 2
+        assert spans[0].operation_name == 'get'
+
     def test_middleware_traced_with_error(self):
         self.verify_traced_with_error()
 
@@ -126,6 +185,46 @@ class TestDjangoOpenTracingMiddleware(SimpleTestCase):
         spans = settings.OPENTRACING_TRACING._tracer.finished_spans()
         assert len(spans) == 1 # Span finished properly.
 
+    def test_middleware_traced_parent(self):
+        self.verify_traced_parent()
+
+    @override_settings(OPENTRACING_PROPAGATION_HEADERS=[
+        'ot-tracer-traceid', 'ot-tracer-spanid', 'ot-baggage-*'
+    ])
+    def test_middleware_traced_parent_propagation_headers(self):
+        self.verify_traced_parent()
+
+    def verify_traced_parent(self):
+        client = Client()
+        client.get('/traced/',
+                   HTTP_OT_TRACER_TRACEID='5',
+                   HTTP_OT_TRACER_SPANID='6',
+                   HTTP_OT_BAGGAGE_USER='alice',
+                   HTTP_USER_AGENT='test')
+
+        spans = settings.OPENTRACING_TRACING._tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].context.trace_id == 5
+        assert spans[0].parent_id == 6
+        assert spans[0].context.baggage == {'user': 'alice'}
+
+    def test_propagation_headers(self):
+        tracing = DjangoTracing()
+        tracing._set_propagation_headers(['X-Trace-Id', 'x-baggage-*'])
+        request = mock.Mock(META={
+            'HTTP_X_TRACE_ID': '1',
+            'HTTP_X_BAGGAGE_A': '2',
+            'HTTP_USER_AGENT': 'test',
+            'CONTENT_TYPE': 'text/plain',
+        })
+        assert tracing._get_headers(request) == {
+            'x-trace-id': '1',
+            'x-baggage-a': '2',
+        }
+
+        tracing._set_propagation_headers(None)
+        assert len(tracing._get_headers(request)) == 4
+
     def test_middleware_traced_scope(self):
         client = Client()
         response = client.get('/traced_scope/')
@@ -205,3 +304,31 @@ class TestDjangoOpenTracingMiddlewareInitialization(SimpleTestCase):
             assert getattr(settings, 'OPENTRACING_TRACING', None) is not None
             assert settings.OPENTRACING_TRACING.tracer is opentracing.tracer
             assert settings.OPENTRACING_TRACING._get_tracer_impl() is None
+
+
+class TestDjangoOpenTracingMiddlewareConfig(SimpleTestCase):
+
+    def test_config_resolved_once(self):
+        middleware = OpenTracingMiddleware()
+        assert middleware._config.traced_attributes == ('META',
+                                                        'FAKE_ATTRIBUTE')
+
+        with mock.patch.object(settings, 'OPENTRACING_TRACED_ATTRIBUTES',
+                               ['path']):
+            assert middleware._config.traced_attributes == (
+                'META', 'FAKE_ATTRIBUTE'
+            )
+
+    def test_config_setting_changed(self):
+        middleware = OpenTracingMiddleware()
+        tracing = settings.OPENTRACING_TRACING
+        assert middleware._config.trace_all is True
+
+        with override_settings(OPENTRACING_TRACE_ALL=False,
+                               OPENTRACING_TRACED_ATTRIBUTES=['path']):
+            assert middleware._config.trace_all is False
+            assert middleware._config.traced_attributes == ('path',)
+            assert tracing._trace_all is False
+
+        assert middleware._config.trace_all is True
+        assert tracing._trace_all is True
@@ -0,0 +1,83 @@
+import functools
+
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+import mock
+
+from django_opentracing.naming import OperationNameResolver
+
+from . import views
+
+
+class TestOperationNameResolver(SimpleTestCase):
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            OperationNameResolver('unknown')
+
+    def test_memoized(self):
+        resolver = OperationNameResolver('route')
+        request = mock.Mock(resolver_match=mock.Mock(route='^a/(?P<b>.+)/$'))
+        assert resolver(request, views.untraced_func) == 'a/(?P<b>.+)/'
+
+        with mock.patch('django_opentracing.naming._ROUTE_ANCHORS') as regex:
+            assert resolver(request, views.untraced_func) == 'a/(?P<b>.+)/'
+            assert not regex.sub.called
+
+    def test_partials(self):
+        resolver = OperationNameResolver()
+        request = mock.Mock(resolver_match=None)
+        for i in range(3):
+            view = views.UntracedView()
+            assert resolver(request, functools.partial(view.get)) == 'get'
+        assert len(resolver._names) == 1
+
+    def test_max_names(self):
+        resolver = OperationNameResolver()
+        request = mock.Mock(resolver_match=None)
+        with mock.patch('django_opentracing.naming.MAX_NAMES', 2):
+            for i in range(3):
+                resolver(request, mock.Mock(__name__='view%d' % i))
+        assert len(resolver._names) == 2
+
+    def test_callable(self):
+        resolver = OperationNameResolver(
+            lambda r, v: r.method + ' ' + v.__name__
+        )
+        request = mock.Mock(method='GET')
+        assert resolver(request, views.untraced_func) == 'GET untraced_func'
+
+
+class TestDjangoOpenTracingOperationName(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_operation_name(self, path):
+        Client().get(path)
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        settings.OPENTRACING_TRACING._tracer.reset()
+        return spans[0].operation_name
+
+    def test_function(self):
+        assert self.get_operation_name('/untraced/') == 'untraced_func'
+
+    @override_settings(OPENTRACING_OPERATION_NAME='qualname')
+    def test_qualname(self):
+        assert self.get_operation_name('/untraced/') == \
+            'test_site.views.untraced_func'
+        assert self.get_operation_name('/untraced_class/') == \
+            'test_site.views.UntracedView'
+
+    @override_settings(OPENTRACING_OPERATION_NAME='view_name')
+    def test_view_name(self):
+        assert self.get_operation_name('/untraced_named/') == \
+            'untraced-named'
+        assert self.get_operation_name('/untraced/') == \
+            'test_site.views.untraced_func'
+
+    @override_settings(OPENTRACING_OPERATION_NAME='route')
+    def test_route(self):
+        assert self.get_operation_name('/untraced_named/') == \
+            'untraced_named/'
@@ -0,0 +1,65 @@
+import re
+
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+
+from django_opentracing.paths import PathMatcher
+
+
+class TestPathMatcher(SimpleTestCase):
+
+    def test_empty(self):
+        matcher = PathMatcher([])
+        assert not matcher
+        assert not matcher.match('/')
+
+    def test_prefix(self):
+        matcher = PathMatcher(['/static/', '/health'])
+        assert matcher
+        assert matcher.match('/static/app.css')
+        assert matcher.match('/healthz')
+        assert not matcher.match('/api/static/')
+
+    def test_glob(self):
+        matcher = PathMatcher(['/media/*.png', '/v?/metrics'])
+        assert matcher.match('/media/a/b.png')
+        assert matcher.match('/v1/metrics')
+        assert not matcher.match('/media/a.jpg')
+
+    def test_regex(self):
+        matcher = PathMatcher([re.compile(r'/admin/(js|css)/'), '/static/'])
+        assert matcher.match('/admin/js/core.js')
+        assert matcher.match('/static/')
+        assert not matcher.match('/admin/')
+        assert not matcher.match('/x/admin/js/')
+
+    def test_regex_flags(self):
+        matcher = PathMatcher([re.compile('/admin/', re.I),
+                               re.compile('/api/'),
+                               re.compile('(?i)/docs/')])
+        assert matcher.match('/ADMIN/')
+        assert matcher.match('/DOCS/')
+        assert not matcher.match('/API/')
+
+    def test_regex_group_names(self):
+        matcher = PathMatcher([re.compile(r'/a/(?P<id>\d+)/'),
+                               re.compile(r'/b/(?P<id>\d+)/')])
+        assert matcher.match('/a/1/')
+        assert matcher.match('/b/2/')
+        assert not matcher.match('/c/3/')
+
+
+class TestDjangoOpenTracingExcludedPaths(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    @override_settings(OPENTRACING_EXCLUDED_PATHS=['/untraced/'])
+    def test_middleware_excluded(self):
+        client = Client()
+        response = client.get('/untraced/')
+        assert response['numspans'] == '0'
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
+
+        client.get('/traced/')
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 1
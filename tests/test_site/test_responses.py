@@ -0,0 +1,155 @@
+from django.test import SimpleTestCase, Client, RequestFactory
+from django.test import override_settings
+from django.conf import settings
+
+from django_opentracing import OpenTracingMiddleware
+from test_site import views
+
+
+@override_settings(OPENTRACING_TRACE_BREAKDOWN=True)
+class TestDjangoOpenTracingBreakdown(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_spans(self):
+        return settings.OPENTRACING_TRACING.tracer.finished_spans()
+
+    def test_sizes(self):
+        Client().post('/untraced/', data=b'x' * 10,
+                      content_type='application/octet-stream')
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.request_content_length'] == 10
+        assert spans[0].tags['http.response_content_length'] == 0
+        assert spans[0].tags['http.pre_view_ms'] >= 0
+        assert 'http.ttfb_ms' not in spans[0].tags
+        # the start time is kept out of the traced META.
+        assert 'REQUEST_METHOD' in spans[0].tags['META']
+        assert 'django_opentracing.started' not in spans[0].tags['META']
+
+    def test_streaming(self):
+        response = Client().get('/streaming/')
+        # the span is finished once the body has been consumed.
+        assert len(self.get_spans()) == 0
+        assert settings.OPENTRACING_TRACING.live_scopes == 0
+
+        assert b''.join(response.streaming_content) == \
+            b'chunk 0chunk 1chunk 2'
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.response_content_length'] == 21
+        assert 0 <= spans[0].tags['http.ttfb_ms'] <= \
+            spans[0].tags['http.total_ms']
+        assert spans[0].finish_time >= spans[0].start_time
+
+    def test_streaming_closed(self):
+        response = Client().get('/streaming/')
+        next(iter(response.streaming_content))
+        response.close()
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.response_content_length'] == 7
+
+    @override_settings(OPENTRACING_TRACE_BREAKDOWN=False)
+    def test_disabled(self):
+        Client().get('/untraced/')
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert 'http.response_content_length' not in spans[0].tags
+        assert 'http.pre_view_ms' not in spans[0].tags
+
+
+class TestDjangoOpenTracingStreaming(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_spans(self):
+        return settings.OPENTRACING_TRACING.tracer.finished_spans()
+
+    def test_streaming(self):
+        response = Client().get('/streaming/')
+        assert len(self.get_spans()) == 0
+
+        list(response.streaming_content)
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.response_content_length'] == 21
+        assert spans[0].tags['http.streaming_ms'] >= 0
+        assert 'http.streaming_aborted' not in spans[0].tags
+        assert 'http.ttfb_ms' not in spans[0].tags
+
+    def test_streaming_aborted(self):
+        response = Client().get('/streaming/')
+        next(iter(response.streaming_content))
+        response.close()
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.streaming_aborted'] is True
+
+    def test_file(self):
+        response = Client().get('/file/')
+        assert len(self.get_spans()) == 0
+
+        assert b''.join(response.streaming_content) == b'x' * 100
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.response_content_length'] == 100
+
+    def test_file_wrapper(self):
+        # servers sending files with wsgi.file_wrapper only close them.
+        response = Client().get('/file/')
+        response.close()
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.response_content_length'] == 100
+        assert 'http.streaming_aborted' not in spans[0].tags
+
+    def test_file_to_stream(self):
+        # the file is left to the server, e.g. for wsgi.file_wrapper.
+        def get_response(request):
+            middleware.process_view(request, views.file_func, (), {})
+            response = views.file_func(request)
+            self.file = response.file_to_stream
+            return response
+
+        middleware = OpenTracingMiddleware(get_response)
+        response = middleware(RequestFactory().get('/file/'))
+        assert self.file is not None
+        assert response.file_to_stream is self.file
+        assert len(self.get_spans()) == 0
+
+        response.close()
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert spans[0].tags['http.response_content_length'] == 100
+
+    @override_settings(OPENTRACING_TRACE_STREAMING=False)
+    def test_disabled(self):
+        Client().get('/streaming/')
+
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert 'http.streaming_ms' not in spans[0].tags
+
+    @override_settings(OPENTRACING_TRACE_STREAMING=False,
+                       OPENTRACING_TRACE_BREAKDOWN=True)
+    def test_disabled_breakdown(self):
+        response = Client().get('/streaming/')
+
+        # finished when the response is returned, before its body is sent.
+        spans = self.get_spans()
+        assert len(spans) == 1
+        assert 'http.streaming_ms' not in spans[0].tags
+        assert 'http.total_ms' not in spans[0].tags
+        assert 'http.response_content_length' not in spans[0].tags
+        assert 'http.pre_view_ms' in spans[0].tags
+        response.getvalue()
+        assert len(self.get_spans()) == 1
@@ -0,0 +1,171 @@
+import unittest
+
+import django
+from django.test import SimpleTestCase, Client, RequestFactory, \
+    override_settings
+from django.conf import settings
+
+from django_opentracing import trace_options
+from django_opentracing.routes import RouteRegistry
+from django_opentracing.sampling import Sampler
+
+from . import views
+
+
+@trace_options(trace_db=False, db_slow_query_ms=5)
+def view(request):
+    pass
+
+
+class NeverSampler(Sampler):
+
+    def is_sampled(self, request, view_func, parent_context=None):
+        return False
+
+
+class TestRouteRegistry(SimpleTestCase):
+
+    def test_no_options(self):
+        registry = RouteRegistry()
+        request = RequestFactory().get('/')
+        assert registry.get(request, views.index) is None
+
+    def test_decorator(self):
+        registry = RouteRegistry()
+        request = RequestFactory().get('/')
+        route = registry.get(request, views.trace_options_func)
+        assert route.trace is False
+        assert route.sampler is None
+
+    def test_precedence(self):
+        registry = RouteRegistry({
+            'test_site.test_routes.view': {
+                'traced_attributes': ['path'],
+                'db_slow_query_ms': 10,
+            },
+            'app:view': {'db_slow_query_ms': 20},
+        })
+        request = RequestFactory().get('/')
+        route = registry.get(request, view)
+        assert route.trace_db is False
+        assert route.db_slow_query_ms == 10
+        assert [e.tag for e in route.traced_attributes] == ['path']
+
+        request.resolver_match = type('Match', (), {'view_name': 'app:view'})
+        assert registry.get(request, view).db_slow_query_ms == 20
+
+    def test_resolved_once(self):
+        registry = RouteRegistry()
+        request = RequestFactory().get('/')
+        route = registry.get(request, views.trace_options_func)
+        assert registry.get(request, views.trace_options_func) is route
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            trace_options(fake_option=True)
+        with self.assertRaises(ValueError):
+            RouteRegistry({'index': {'fake_option': True}})
+
+
+class TestDjangoOpenTracingRoutes(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_spans(self, path):
+        Client().get(path)
+        return settings.OPENTRACING_TRACING.tracer.finished_spans()
+
+    def test_decorator_not_traced(self):
+        assert len(self.get_spans('/trace_options/')) == 0
+
+    @override_settings(OPENTRACING_ROUTES={
+        'untraced-named': {
+            'traced_attributes': {'request.path': 'path'},
+            'start_span_cb': lambda span, request: span.set_tag('cb', 1),
+        },
+        'test_site.views.UntracedView': {'sampler': NeverSampler()},
+    })
+    def test_settings(self):
+        # by URL name, taking precedence over the view path.
+        spans = self.get_spans('/untraced_named/')
+        assert len(spans) == 1
+        assert spans[0].tags['request.path'] == '/untraced_named/'
+        assert spans[0].tags['cb'] == 1
+        assert 'META' not in spans[0].tags
+
+        # by view path.
+        settings.OPENTRACING_TRACING._tracer.reset()
+        assert len(self.get_spans('/untraced_class/')) == 0
+
+        spans = self.get_spans('/untraced/')
+        assert len(spans) == 1
+        assert 'META' in spans[0].tags
+
+    @unittest.skipIf(django.VERSION < (2, 0), 'requires Django >= 2.0')
+    @override_settings(OPENTRACING_TRACE_DB=True, OPENTRACING_ROUTES={
+        'test_site.views.db_func': {'trace_db': False},
+    })
+    def test_trace_db(self):
+        spans = self.get_spans('/db/')
+        assert len(spans) == 1
+        assert 'db.query_count' not in spans[0].tags
+
+    @override_settings(OPENTRACING_TRACE_CACHE=True,
+                       OPENTRACING_TRACE_TEMPLATES=True,
+                       OPENTRACING_ROUTES={
+                           'test_site.views.cache_func': {
+                               'trace_cache': False,
+                           },
+                           'test_site.views.template_func': {
+                               'template_max_spans': 1,
+                           },
+                       })
+    def test_trace_cache_templates(self):
+        spans = self.get_spans('/cache/')
+        assert len(spans) == 1
+        assert 'cache.calls' not in spans[0].tags
+
+        settings.OPENTRACING_TRACING._tracer.reset()
+        spans = self.get_spans('/template/')
+        assert len(spans) == 2
+        assert spans[-1].tags['template.render_count'] == 4
+
+    @override_settings(OPENTRACING_TRACE_ALL=False, OPENTRACING_ROUTES={
+        'test_site.views.traced_func': {'trace': False},
+        'test_site.views.traced_func_with_attrs': {
+            'traced_attributes': ['method'],
+        },
+        'test_site.views.traced_func_with_arg': {'sampler': NeverSampler()},
+    })
+    def test_decorated(self):
+        # the middleware configures the tracing of the decorators.
+        with override_settings(OPENTRACING_TRACER=views.tracing,
+                               OPENTRACING_TRACING=views.tracing):
+            views.tracing.tracer.reset()
+            for path in ('/traced/', '/traced_with_arg/1/',
+                         '/traced_with_attrs/'):
+                Client().get(path)
+
+        spans = views.tracing.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == 'traced_func_with_attrs'
+        assert spans[0].tags['method'] == 'GET'
+        assert 'path' not in spans[0].tags
+
+    def test_decorated_options(self):
+        paths = ('/traced_options_below/', '/traced_options_above/')
+        with override_settings(OPENTRACING_TRACER=views.tracing,
+                               OPENTRACING_TRACING=views.tracing):
+            # by the middleware,
+            views.tracing.tracer.reset()
+            for path in paths:
+                Client().get(path)
+            assert views.tracing.tracer.finished_spans() == []
+
+            # and by the decorator, whichever is applied first.
+            with override_settings(OPENTRACING_TRACE_ALL=False):
+                for path in paths:
+                    Client().get(path)
+            assert views.tracing.tracer.finished_spans() == []
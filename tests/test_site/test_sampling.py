@@ -0,0 +1,111 @@
+import functools
+
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+import mock
+
+from django_opentracing.sampling import (
+    ParentBasedSampler,
+    ProbabilisticSampler,
+    RateLimitingSampler,
+    Sampler,
+)
+
+from . import views
+
+
+class NeverSampler(Sampler):
+    def is_sampled(self, request, view_func, parent_context=None):
+        return False
+
+
+class TestSamplers(SimpleTestCase):
+
+    def test_probabilistic(self):
+        assert ProbabilisticSampler(1.0).is_sampled(None, None)
+        assert not ProbabilisticSampler(0.0).is_sampled(None, None)
+
+        with self.assertRaises(ValueError):
+            ProbabilisticSampler(1.5)
+
+    def test_rate_limiting(self):
+        sampler = RateLimitingSampler(2)
+        with mock.patch('django_opentracing.sampling._now',
+                        return_value=100.0):
+            assert sampler.is_sampled(None, 'a')
+            assert sampler.is_sampled(None, 'a')
+            assert not sampler.is_sampled(None, 'a')
+
+            # other views have their own bucket.
+            assert sampler.is_sampled(None, 'b')
+
+        with mock.patch('django_opentracing.sampling._now',
+                        return_value=100.5):
+            assert sampler.is_sampled(None, 'a')
+            assert not sampler.is_sampled(None, 'a')
+
+    def test_rate_limiting_buckets(self):
+        sampler = RateLimitingSampler(1)
+        view = views.UntracedView()
+        assert sampler.is_sampled(None, functools.partial(view.get))
+        # partials of the same method share a bucket.
+        view = views.UntracedView()
+        assert not sampler.is_sampled(None, functools.partial(view.get))
+
+        with mock.patch('django_opentracing.sampling.MAX_BUCKETS', 2):
+            sampler.is_sampled(None, 'a')
+            sampler.is_sampled(None, 'b')
+        assert list(sampler._buckets) == ['a', 'b']
+
+    def test_parent_based(self):
+        sampler = ParentBasedSampler(NeverSampler())
+        assert not sampler.is_sampled(None, None, None)
+        assert sampler.is_sampled(None, None, object())
+        assert not sampler.is_sampled(None, None,
+                                      mock.Mock(is_sampled=lambda: False))
+        assert sampler.is_sampled(None, None, mock.Mock(spec=['sampled'],
+                                                        sampled=True))
+
+        assert ParentBasedSampler().is_sampled(None, None, None)
+
+
+class TestDjangoOpenTracingSampling(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    @override_settings(OPENTRACING_SAMPLER=NeverSampler())
+    def test_middleware_unsampled(self):
+        client = Client()
+        response = client.get('/untraced/')
+        assert response['numspans'] == '0'
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
+
+    @override_settings(OPENTRACING_SAMPLER=NeverSampler(),
+                       OPENTRACING_TRACE_ALL=False)
+    def test_middleware_unsampled_decorated(self):
+        client = Client()
+        response = client.get('/traced/')
+        assert response['numspans'] == '0'
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
+
+    @override_settings(OPENTRACING_SAMPLER=NeverSampler(),
+                       OPENTRACING_TRACE_ALL=False)
+    def test_middleware_unsampled_error_decorated(self):
+        client = Client()
+        with self.assertRaises(ValueError):
+            client.get('/traced_with_error/')
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
+
+    @override_settings(OPENTRACING_SAMPLER=ParentBasedSampler(NeverSampler()))
+    def test_middleware_parent_based(self):
+        client = Client()
+        client.get('/traced/')
+        assert len(settings.OPENTRACING_TRACING.tracer.finished_spans()) == 0
+
+        client.get('/traced/',
+                   HTTP_OT_TRACER_TRACEID='5',
+                   HTTP_OT_TRACER_SPANID='6')
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].parent_id == 6
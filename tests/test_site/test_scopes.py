@@ -0,0 +1,76 @@
+import gc
+
+from django.test import SimpleTestCase
+import mock
+from opentracing.mocktracer import MockTracer
+
+from django_opentracing.scopes import ScopeRegistry
+
+
+class Request(object):
+    pass
+
+
+class TestScopeRegistry(SimpleTestCase):
+
+    def setUp(self):
+        self.tracer = MockTracer()
+
+    def start_scope(self):
+        return mock.Mock(span=self.tracer.start_span('request'))
+
+    def test_get_pop(self):
+        registry = ScopeRegistry()
+        request = Request()
+        scope = self.start_scope()
+
+        registry[request] = scope
+        assert len(registry) == 1
+        assert registry.get(request) is scope
+        assert registry.get(Request()) is None
+
+        assert registry.pop(request) is scope
+        assert registry.pop(request) is None
+        assert len(registry) == 0
+        assert registry.reaped == 0
+
+    def test_request_collected(self):
+        registry = ScopeRegistry()
+        request = Request()
+        registry[request] = self.start_scope()
+
+        del request
+        gc.collect()
+
+        assert len(registry) == 0
+        assert registry.reaped == 1
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].logs[0].key_values['event'] == 'reaped'
+
+    def test_max_scopes(self):
+        registry = ScopeRegistry(max_scopes=2)
+        requests = [Request() for _ in range(3)]
+        for request in requests:
+            registry[request] = self.start_scope()
+
+        assert len(registry) == 2
+        assert registry.reaped == 1
+        assert registry.get(requests[0]) is None
+        assert registry.get(requests[2]) is not None
+        assert len(self.tracer.finished_spans()) == 1
+
+    def test_max_age(self):
+        registry = ScopeRegistry(max_age=10)
+        old, new = Request(), Request()
+        with mock.patch('django_opentracing.scopes._now', return_value=100):
+            registry[old] = self.start_scope()
+        with mock.patch('django_opentracing.scopes._now', return_value=105):
+            registry[new] = self.start_scope()
+
+        with mock.patch('django_opentracing.scopes._now', return_value=112):
+            registry.reap()
+
+        assert registry.get(old) is None
+        assert registry.get(new) is not None
+        assert registry.reaped == 1
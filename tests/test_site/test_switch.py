@@ -0,0 +1,128 @@
+import os
+import shutil
+import signal
+import tempfile
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import SimpleTestCase, Client, RequestFactory
+from django.test import override_settings
+from django.conf import settings
+import mock
+
+from django_opentracing import OpenTracingMiddleware
+from django_opentracing.switch import FileSwitch, install_toggle_signal
+from test_site import views
+
+
+class TestDjangoOpenTracingSwitch(SimpleTestCase):
+
+    def setUp(self):
+        self.tracing = settings.OPENTRACING_TRACING
+        self.tracing._tracer.reset()
+
+    def tearDown(self):
+        self.tracing.enabled = True
+
+    def get_spans(self, path):
+        response = Client().get(path)
+        assert response.status_code == 200
+        return self.tracing._tracer.finished_spans()
+
+    def test_disabled_at_startup(self):
+        with override_settings(OPENTRACING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                OpenTracingMiddleware()
+
+            assert self.tracing.enabled is False
+            assert len(self.get_spans('/untraced/')) == 0
+
+            with override_settings(OPENTRACING_TRACE_ALL=False):
+                assert len(self.get_spans('/traced/')) == 0
+
+    def test_disabled_at_runtime(self):
+        client = Client()
+        client.get('/untraced/')
+        assert len(self.tracing._tracer.finished_spans()) == 1
+
+        self.tracing.enabled = False
+        client.get('/untraced/')
+        with override_settings(OPENTRACING_TRACE_ALL=False):
+            self.tracing.enabled = False
+            client.get('/traced/')
+        assert len(self.tracing._tracer.finished_spans()) == 1
+        assert self.tracing.live_scopes == 0
+
+        self.tracing.enabled = True
+        client.get('/untraced/')
+        assert len(self.tracing._tracer.finished_spans()) == 2
+
+    def test_toggled_during_request(self):
+        def get_response(request):
+            # turned on after the request started: it is not traced.
+            self.tracing.enabled = True
+            middleware.process_view(request, views.untraced_func, (), {})
+            return views.untraced_func(request)
+
+        middleware = OpenTracingMiddleware(get_response)
+        self.tracing.enabled = False
+        middleware(RequestFactory().get('/untraced/'))
+        assert self.tracing.live_scopes == 0
+        assert len(self.tracing._tracer.finished_spans()) == 0
+
+    @override_settings(OPENTRACING_ENABLED=False,
+                       OPENTRACING_TRACE_CACHE=True)
+    def test_disabled_not_installed(self):
+        with mock.patch('django_opentracing.middleware.'
+                        'install_cache_tracing') as install:
+            with self.assertRaises(MiddlewareNotUsed):
+                OpenTracingMiddleware()
+        assert not install.called
+
+    def test_toggle_signal(self):
+        previous = signal.getsignal(signal.SIGUSR2)
+        try:
+            install_toggle_signal(self.tracing, 'SIGUSR2')
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert self.tracing.enabled is False
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert self.tracing.enabled is True
+        finally:
+            signal.signal(signal.SIGUSR2, previous)
+
+    def test_file_switch(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'tracing-off')
+        try:
+            switch = FileSwitch(path, interval=0)
+            switch.check(self.tracing)
+            assert self.tracing.enabled is True
+
+            open(path, 'w').close()
+            switch.check(self.tracing)
+            assert self.tracing.enabled is False
+
+            # only changes of the file override other toggles.
+            self.tracing.enabled = True
+            switch.check(self.tracing)
+            assert self.tracing.enabled is True
+
+            os.remove(path)
+            self.tracing.enabled = False
+            switch.check(self.tracing)
+            assert self.tracing.enabled is True
+        finally:
+            shutil.rmtree(directory)
+
+    def test_disabled_file_setting(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'tracing-off')
+        try:
+            with override_settings(OPENTRACING_DISABLED_FILE=path,
+                                   OPENTRACING_DISABLED_FILE_INTERVAL=0):
+                open(path, 'w').close()
+                assert len(self.get_spans('/untraced/')) == 0
+
+                os.remove(path)
+                assert len(self.get_spans('/untraced/')) == 1
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,156 @@
+import gc
+import unittest
+
+import django
+from django.test import SimpleTestCase, Client, RequestFactory
+from django.test import override_settings
+from django.conf import settings
+from opentracing.ext import tags
+
+from django_opentracing.tail_sampling import BufferedSpan, TailSampler
+
+
+# the children of the request spans are mostly query spans.
+@unittest.skipIf(django.VERSION < (2, 0), 'requires Django >= 2.0')
+class TestDjangoOpenTracingTailSampling(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_spans(self, path, sampler):
+        settings.OPENTRACING_TRACING._tracer.reset()
+        with override_settings(OPENTRACING_TAIL_SAMPLER=sampler,
+                               OPENTRACING_TRACE_DB=True):
+            Client().get(path)
+        assert sampler.buffered == 0
+        return settings.OPENTRACING_TRACING._tracer.finished_spans()
+
+    def test_dropped(self):
+        sampler = TailSampler()
+        assert self.get_spans('/db/', sampler) == []
+        assert sampler.dropped == 1
+        assert sampler.kept == 0
+
+    def test_error(self):
+        sampler = TailSampler()
+        with self.assertRaises(ValueError):
+            self.get_spans('/traced_with_error/', sampler)
+
+        spans = settings.OPENTRACING_TRACING._tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].tags[tags.ERROR] is True
+        assert sampler.kept == 1
+
+    def test_server_error(self):
+        sampler = TailSampler()
+        assert len(self.get_spans('/status/503/', sampler)) == 1
+        assert len(self.get_spans('/status/404/', sampler)) == 0
+        assert sampler.kept == 1
+        assert sampler.dropped == 1
+
+    def test_slow(self):
+        sampler = TailSampler(slow_ms=0)
+        spans = self.get_spans('/db/', sampler)
+        assert len(spans) == 5
+
+        # children are reported before, and parented on, the request span.
+        request_span = spans[-1]
+        assert request_span.operation_name == 'db_func'
+        for span in spans[:-1]:
+            assert span.parent_id == request_span.context.span_id
+            assert span.finish_time <= request_span.finish_time
+
+    def test_route_slow_ms(self):
+        sampler = TailSampler(slow_ms=10000)
+        routes = {'test_site.views.db_func': {'slow_ms': 0}}
+        with override_settings(OPENTRACING_ROUTES=routes):
+            assert len(self.get_spans('/db/', sampler)) == 5
+            assert len(self.get_spans('/untraced/', sampler)) == 0
+
+    def test_keep_rate(self):
+        sampler = TailSampler(keep_rate=1.0)
+        assert len(self.get_spans('/db/', sampler)) == 5
+
+    def test_evicted(self):
+        sampler = TailSampler(keep_rate=1.0, max_spans_per_trace=2)
+        spans = self.get_spans('/db/', sampler)
+        assert len(spans) == 3
+        assert spans[-1].tags['sampling.truncated'] is True
+        assert sampler.evicted == 2
+
+        sampler = TailSampler(keep_rate=1.0, max_spans=0)
+        spans = self.get_spans('/db/', sampler)
+        assert len(spans) == 1
+        assert sampler.evicted == 4
+
+    def test_active_span(self):
+        sampler = TailSampler()
+        with override_settings(OPENTRACING_TAIL_SAMPLER=sampler):
+            tracer = settings.OPENTRACING_TRACING.tracer
+            with tracer.start_active_span('outside') as scope:
+                assert not isinstance(scope.span, BufferedSpan)
+
+        spans = settings.OPENTRACING_TRACING._tracer.finished_spans()
+        assert [span.operation_name for span in spans] == ['outside']
+
+    def test_invalid_keep_rate(self):
+        with self.assertRaises(ValueError):
+            TailSampler(keep_rate=2)
+
+
+class TestDjangoOpenTracingDeferredTags(SimpleTestCase):
+
+    def setUp(self):
+        self.tracing = settings.OPENTRACING_TRACING
+        self.tracing._tracer.reset()
+        self.calls = []
+
+    def tearDown(self):
+        self.tracing._tail_sampler = None
+
+    def user_agent(self, request):
+        self.calls.append(request)
+        return 'agent'
+
+    def get(self, path):
+        attributes = {'agent': self.user_agent}
+        with override_settings(OPENTRACING_TAIL_SAMPLER=TailSampler(),
+                               OPENTRACING_TRACED_ATTRIBUTES=attributes):
+            Client().get(path)
+        return self.tracing._tracer.finished_spans()
+
+    def test_dropped(self):
+        assert self.get('/status/404/') == []
+        assert self.calls == []
+
+    def test_kept(self):
+        span, = self.get('/status/503/')
+        assert len(self.calls) == 1
+        assert span.tags['agent'] == 'agent'
+        assert span.tags[tags.HTTP_URL] == '/status/503/'
+        assert span.tags[tags.COMPONENT] == 'django'
+
+    def test_request_collected(self):
+        self.tracing._tail_sampler = TailSampler(keep_rate=1.0)
+        request = RequestFactory().get('/traced/')
+        self.tracing._apply_tracing(request, lambda request: None, ())
+        scope = self.tracing._current_scopes.get(request)
+        scope.close()
+
+        # the deferred tags do not keep the request alive.
+        reaped = self.tracing.reaped_scopes
+        del request
+        gc.collect()
+        assert self.tracing.reaped_scopes == reaped + 1
+
+        span, = self.tracing._tracer.finished_spans()
+        assert span.tags[tags.COMPONENT] == 'django'
+        assert tags.HTTP_URL not in span.tags
+
+    def test_defer_tags(self):
+        tracer = self.tracing.tracer
+        span = tracer.start_span('plain')
+        self.tracing.defer_tags(span, lambda span, value: span.set_tag(
+            'deferred', value), 1)
+        assert span.tags['deferred'] == 1
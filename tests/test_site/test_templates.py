@@ -0,0 +1,44 @@
+from django.test import SimpleTestCase, Client, override_settings
+from django.conf import settings
+
+
+@override_settings(OPENTRACING_TRACE_TEMPLATES=True)
+class TestDjangoOpenTracingTemplates(SimpleTestCase):
+
+    def setUp(self):
+        settings.OPENTRACING_TRACING._tracer.reset()
+
+    def get_spans(self):
+        spans = settings.OPENTRACING_TRACING.tracer.finished_spans()
+        request_span = spans[-1]
+        assert request_span.operation_name == 'template_func'
+        return request_span, spans[:-1]
+
+    def test_template_spans(self):
+        response = Client().get('/template/')
+        assert b'<li>3</li>' in response.content
+
+        request_span, template_spans = self.get_spans()
+        assert len(template_spans) == 4
+
+        page_span = template_spans[-1]
+        assert page_span.tags['template.name'] == 'page.html'
+        assert page_span.parent_id == request_span.context.span_id
+        for span in template_spans[:-1]:
+            assert span.tags['template.name'] == 'item.html'
+            assert span.parent_id == page_span.context.span_id
+            assert span.tags['template.self_time_ms'] >= 0
+
+        assert request_span.tags['template.render_count'] == 4
+        summary = request_span.logs[0].key_values
+        assert summary['event'] == 'template.summary'
+        assert summary['item.html'].startswith('count=3 ')
+        assert summary['page.html'].startswith('count=1 ')
+
+    @override_settings(OPENTRACING_TEMPLATE_MAX_SPANS=2)
+    def test_max_spans(self):
+        Client().get('/template/')
+
+        request_span, template_spans = self.get_spans()
+        assert len(template_spans) == 2
+        assert request_span.tags['template.render_count'] == 4
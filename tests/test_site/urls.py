@@ -1,4 +1,5 @@
 from django.conf.urls import url
+import six
 
 from . import views
 
@@ -9,5 +10,32 @@ urlpatterns = [
     url(r'^traced_with_arg/?(?P<arg>\d+)?/?', views.traced_func_with_arg),
     url(r'^traced/', views.traced_func),
     url(r'^traced_scope/', views.traced_scope_func),
-    url(r'^untraced/', views.untraced_func)
+    url(r'^untraced/', views.untraced_func),
+    url(r'^untraced_named/', views.untraced_func, name='untraced-named'),
+    url(r'^untraced_class/', views.UntracedView.as_view()),
+    url(r'^traced_class/(?P<arg>\d+)/', views.TracedView.as_view()),
+    url(r'^method_traced_class/', views.MethodTracedView.as_view()),
+    url(r'^db/', views.db_func),
+    url(r'^cache/', views.cache_func),
+    url(r'^template/', views.template_func),
+    url(r'^streaming/', views.streaming_func),
+    url(r'^file/', views.file_func),
+    url(r'^trace_options/', views.trace_options_func),
+    url(r'^status/(?P<code>\d+)/', views.status_func),
+    url(r'^concurrent/', views.concurrent_func),
+    url(r'^traced_options_below/', views.traced_options_below_func),
+    url(r'^traced_options_above/', views.traced_options_above_func),
 ]
+
+if six.PY3:
+    from . import async_views
+
+    urlpatterns += [
+        url(r'^async_untraced/', async_views.async_untraced_func),
+        url(r'^async_traced/', async_views.async_traced_func),
+        url(r'^async_traced_with_arg/(?P<arg>\d+)/',
+            async_views.async_traced_func_with_arg),
+        url(r'^async_traced_with_error/',
+            async_views.async_traced_func_with_error),
+        url(r'^async_concurrent/', async_views.async_concurrent_func),
+    ]
@@ -1,5 +1,15 @@
-from django.http import HttpResponse
+import io
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.conf import settings
+from django.shortcuts import render
+from django.utils.decorators import method_decorator
+from django.views.generic import View
+
+from django_opentracing import trace_options
 
 tracing = settings.OPENTRACING_TRACING
 
@@ -41,9 +51,85 @@ def untraced_func(request):
     response['numspans'] = currentSpanCount 
     return response
 
+class UntracedView(View):
+    def get(self, request):
+        return HttpResponse()
+
+@tracing.trace()
+class TracedView(View):
+    def get(self, request, arg=None):
+        response = HttpResponse()
+        response['arg'] = arg
+        return response
+
+class MethodTracedView(View):
+    @method_decorator(tracing.trace())
+    def get(self, request):
+        return HttpResponse()
+
 @tracing.trace()
 def traced_scope_func(request):
     response = HttpResponse()
     response['active_span'] = tracing._tracer.active_span
     response['request_span'] = tracing.get_span(request)
     return response
+
+def db_func(request):
+    with connection.cursor() as cursor:
+        for i in range(3):
+            cursor.execute('SELECT %s', [i])
+        cursor.execute('SELECT 1 WHERE 1 IN (%s, %s)', [1, 2])
+    return HttpResponse()
+
+def cache_func(request):
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    cache.get_many(['a', 'b'])
+    cache.delete('a')
+    return HttpResponse()
+
+def template_func(request):
+    return render(request, 'page.html', {'items': [1, 2, 3]})
+
+def streaming_func(request):
+    return StreamingHttpResponse(b'chunk %d' % i for i in range(3))
+
+def file_func(request):
+    return FileResponse(io.BytesIO(b'x' * 100))
+
+@trace_options(trace=False)
+def trace_options_func(request):
+    return HttpResponse()
+
+@tracing.trace()
+@trace_options(trace=False)
+def traced_options_below_func(request):
+    return HttpResponse()
+
+@trace_options(trace=False)
+@tracing.trace()
+def traced_options_above_func(request):
+    return HttpResponse()
+
+def status_func(request, code):
+    return HttpResponse(status=int(code))
+
+def switch():
+    # lets the other threads run while a span is active; greenlets
+    # replace it with gevent.sleep.
+    time.sleep(0.001)
+
+def concurrent_func(request):
+    # the tests create a tracer with the scope manager they check.
+    tracing = settings.OPENTRACING_TRACING
+    tracer = tracing.tracer
+    request_span = tracing.get_span(request)
+    with tracer.start_active_span('child') as scope:
+        scope.span.set_tag('request', request.GET['n'])
+        switch()
+        child_active = tracer.active_span is scope.span
+    response = HttpResponse()
+    response['child_active'] = child_active
+    response['request_active'] = tracer.active_span is request_span
+    return response